@@ -0,0 +1,76 @@
+"""
+Compare the frontier sampling strategies on SIM_VILLA,
+on the time per sampling step and the number of steps to complete the exploration.
+
+run from the repository root: `python -m benchmarking.frontier_sampling_benchmark`
+every strategy runs in its own process, as the runners subscribe to the global event system
+"""
+import logging
+import multiprocessing
+import time
+
+from src.config import FrontierStrategy, PlotLvl, Scenario, cfg
+
+
+def run_exploration(frontier_strategy: FrontierStrategy, max_steps: int = 2000) -> dict:
+    cfg.__init__(
+        plot_lvl=PlotLvl.NONE,
+        scenario=Scenario.SIM_VILLA,
+        frontier_strategy=frontier_strategy,
+    )
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from src.mission_autonomy.mission_runner import MissionRunner
+    from src.platform_autonomy.control.sim.simulated_agent import SimulatedAgent
+    from src.platform_autonomy.platform_runner import PlatformRunner
+    from src.platform_autonomy.state.frontier_sampling_strategies import (
+        FrontierSamplingStrategy,
+    )
+    from src.shared.prior_knowledge.sar_capabilities import Capabilities
+    from src.shared.prior_knowledge.sar_situations import Situations
+    from src.shared.situational_graph import SituationalGraph
+    from src.usecases.search_and_rescue.exploration_mission_initializer import (
+        ExplorationMissionInitializer,
+    )
+    from src.usecases.search_and_rescue.sar_affordances import SAR_AFFORDANCES
+    from src.usecases.search_and_rescue.sar_behaviors import SAR_BEHAVIORS
+
+    sampling_times = []
+    sample_frontiers = FrontierSamplingStrategy.sample_frontiers
+
+    def timed_sample_frontiers(self, local_grid):
+        start = time.perf_counter()
+        frontier_cells = sample_frontiers(self, local_grid)
+        sampling_times.append(time.perf_counter() - start)
+        return frontier_cells
+
+    FrontierSamplingStrategy.sample_frontiers = timed_sample_frontiers
+    try:
+        PlatformRunner(affordances=SAR_AFFORDANCES, behaviors=SAR_BEHAVIORS)
+        agents = [SimulatedAgent({Capabilities.CAN_ASSESS})]
+        situational_graph = SituationalGraph()
+        mission_runner = MissionRunner(
+            agents, situational_graph, ExplorationMissionInitializer()
+        )
+
+        start = time.perf_counter()
+        while not mission_runner.mission_completed and mission_runner.step < max_steps:
+            mission_runner.inner_loop(agents, situational_graph)
+        total_time = time.perf_counter() - start
+    finally:
+        FrontierSamplingStrategy.sample_frontiers = sample_frontiers
+
+    return {
+        "strategy": frontier_strategy.name,
+        "completed": mission_runner.mission_completed,
+        "steps": mission_runner.step,
+        "waypoints": len(situational_graph.get_nodes_by_type(Situations.WAYPOINT)),
+        "sampling_ms_per_step": 1000 * sum(sampling_times) / max(len(sampling_times), 1),
+        "total_s": total_time,
+    }
+
+
+if __name__ == "__main__":
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_exploration, FrontierStrategy):
+            print(result)
@@ -32,6 +32,25 @@ class FiducialEnvironment(Enum):
     TU_DELFT = auto()
 
 
+class UtilityMode(Enum):
+    NAIVE = auto()
+    DISPERSION = auto()  # discount frontiers close to where other agents are or go
+
+
+class FrontierStrategy(Enum):
+    ANGULAR_LOS = auto()  # cast N_SAMPLES rays from the agent
+    RING = auto()  # keep the farthest free radius in the sample ring on each ray
+    BOUNDARY = auto()  # one frontier per segment of the known/unknown boundary
+
+
+class MissionStage(Enum):
+    ALLOCATION = auto()  # tasks for the idle agents
+    PLANNING = auto()  # replanning, agents without a valid plan always plan
+    STATS = auto()
+    RENDERING = auto()
+    INFO_LOG = auto()
+
+
 class Config:
     def __init__(
         self,
@@ -43,6 +62,8 @@ class Config:
         screenshot: bool = False,
         screenshot_folder_name: str = "test",
         fiducial_environment: FiducialEnvironment = FiducialEnvironment.TU_DELFT,
+        utility_mode: UtilityMode = UtilityMode.NAIVE,
+        frontier_strategy: FrontierStrategy = FrontierStrategy.ANGULAR_LOS,
     ):
         self.MAX_STEPS = max_steps
         self.PLOT_LVL = plot_lvl
@@ -53,12 +74,16 @@ class Config:
         self.SCREENSHOT_FOLDER_NAME = screenshot_folder_name
 
         self.FIDUCIAL_ENVIRONMENT = fiducial_environment
+        self.UTILITY_MODE = utility_mode
+        self.FRONTIER_STRATEGY = frontier_strategy
 
         # self.PRUNE_RADIUS_FACTOR = 0.20  # too low (<0.20) and we get dense graph, too high (>0.25) and corners are pruned from inside rooms
         self.PRUNE_RADIUS_FACTOR = 0.18  # too low and we get dense graph, too high and corners are pruned from inside rooms
         self.SAMPLE_RING_WIDTH = 1.0  # 0 - 1.0
         self.SAMPLE_RADIUS_FACTOR = 0.6
         self.WP_SHORTCUT_FACTOR = 0.75
+        self.ROBOT_RADIUS = 0.0  # shortcuts need this much clearance from obstacles, 0 only checks the cells on the line
+        self.LOS_PYRAMID_LEVELS = 0  # coarse occupancy levels to accept free lines early, 0 checks every cell
 
         # instead of doing it like this, how could I compose this behavour?
         if (
@@ -82,12 +107,61 @@ class Config:
         # self.PATH_FINDING_METHOD = "bellman-ford"
         self.PATH_FINDING_METHOD = "dijkstra"
         self.N_SAMPLES = 50  # 30
+        # choose the number of rays from the openness around the agent instead of N_SAMPLES
+        self.ADAPTIVE_N_SAMPLES = False
+        self.ADAPTIVE_N_SAMPLES_MIN = 20  # fully cluttered
+        self.ADAPTIVE_N_SAMPLES_MAX = 70  # fully open
+        self.ADAPTIVE_N_SAMPLES_STEP = 10
+        self.OPENNESS_DOWNSAMPLING = 8  # cells per side of a coarse cell to estimate the openness on
+        self.RING_N_RADII = 4  # radii per ray evaluated by the RING strategy, spread over SAMPLE_RING_WIDTH
+        # sampling results of revisited poses with unchanged surroundings are reused, e.g. 256, 0 disables the cache
+        self.FRONTIER_SAMPLING_CACHE_SIZE = 0
+        # in sim, decode and sample the grids of all agents at their next poses in one batch per step
+        self.BATCHED_SIM_SENSING = False
+        # run every agent as its own asyncio task, moves and sensor reads are awaited in worker threads
+        self.ASYNC_MISSION = False
+        self.SIM_MOVE_DURATION = 0.0  # [s] a simulated move blocks this long, like a real one
+        # run the behaviors of all agents on a thread pool each step, the graph mutations follow in agent order
+        self.THREADED_PLATFORM = False
+        # each stage of a mission step runs every STAGE_PERIODS steps, at most once per STAGE_INTERVALS seconds,
+        # and on average within STAGE_TIME_BUDGETS seconds per step, stages which are not listed run every step.
+        # e.g. STAGE_INTERVALS = {MissionStage.RENDERING: 0.2} renders at 5 Hz however fast the steps are
+        self.STAGE_PERIODS = {MissionStage.INFO_LOG: 50}
+        self.STAGE_INTERVALS: dict[MissionStage, float] = {}
+        self.STAGE_TIME_BUDGETS: dict[MissionStage, float] = {}  # PLANNING runs on the platform, it has no budget
+        self.BOUNDARY_MIN_SEGMENT_CELLS = 1  # shorter boundary segments in view of the agent get no frontier
         self.PRUNE_RADIUS = self.LG_LEN_IN_M * self.PRUNE_RADIUS_FACTOR
+        self.PRUNE_VERIFY = False  # also run the full O(waypoints x frontiers) prune sweep and compare
         self.AT_WP_MARGIN = 0.25
         # self.PREV_POS_MARGIN = 0.15
         self.PREV_POS_MARGIN = 0.35
         self.MOVE_TO_POS_ARRIVAL_MARGIN = 0.5
         self.WP_SHORTCUT_MARGIN = (self.LG_LEN_IN_M / 2) * self.WP_SHORTCUT_FACTOR
+        # frontiers closer than the prune radius to each other are redundant,
+        # visiting one of them places a waypoint which prunes the others
+        self.FRONTIER_CLUSTERING = False
+        self.FRONTIER_CLUSTER_SIZE = self.PRUNE_RADIUS
+        self.BOUNDARY_SEGMENT_LEN = self.PRUNE_RADIUS / 2  # [m] of boundary per frontier for the BOUNDARY strategy
+
+        # fuse every local grid into a global occupancy map shared by the agents
+        self.GLOBAL_MAP = False
+        self.GLOBAL_MAP_TILE_SIZE = 64  # cells per tile side
+        self.GLOBAL_MAP_MAX_TILES = 4096  # least recently used tiles are evicted beyond this
+        # periodically look for shortcuts between all waypoint pairs on the global map
+        self.GLOBAL_SHORTCUTS = False  # needs GLOBAL_MAP
+        self.GLOBAL_SHORTCUT_PERIOD = 10  # steps
+        self.GLOBAL_SHORTCUT_BUDGET = 200  # waypoints searched from plus waypoint pairs tested per pass
+        self.GLOBAL_SHORTCUT_RADIUS = self.LG_LEN_IN_M
+        self.GLOBAL_SHORTCUT_MAX_EXTENT = 2 * self.GLOBAL_SHORTCUT_RADIUS  # of the waypoints searched from per pass
+        self.GLOBAL_SHORTCUT_MIN_GAIN = 1.5  # only add shortcuts which make the path this much shorter
+
+        # task allocation hyperparameters
+        # agents closer than half a local grid to each other sense mostly the same cells
+        self.DISPERSION_RADIUS = self.LG_LEN_IN_M / 2
+        self.DISPERSION_PENALTY = 0.5  # 0 - 1.0, utility discount for a frontier on top of another agent
+        self.TASK_PREFILTER = False  # only search paths to the tasks closest to the agent
+        self.TASK_PREFILTER_K = 10
+        self.TASK_PREFILTER_HIGH_REWARD = 100  # tasks with at least this reward are always evaluated
 
         # SIM PARAMS
         self.NUM_AGENTS = num_agents
@@ -151,6 +225,8 @@ class Config:
             0.9  # this cannot be 1 for Angular sampling strategy
         )
         self.WP_SHORTCUT_FACTOR = 1.0
+        # radius aware shortcuts reject doorways the plain line check accepted, opt in once tested on spot
+        # self.ROBOT_RADIUS = 0.25  # half the width of spot
         self.AT_WP_MARGIN = (
             # 0.35  # hopefully this makes it more robust on real spot in doorways
             0.4  # hopefully this makes it more robust on real spot in doorways
@@ -235,6 +311,7 @@ cfg = Config()
 # cfg = Config(num_agents=5, scenario=Scenario.SIM_MAZE_MEDIUM)
 # cfg = Config(num_agents=2)
 # cfg = Config(num_agents=10, scenario=Scenario.SIM_MAZE_MEDIUM)
+# cfg = Config(num_agents=5, scenario=Scenario.SIM_MAZE_MEDIUM, utility_mode=UtilityMode.DISPERSION)
 # cfg = Config(plot_lvl=PlotLvl.NONE)
 # cfg = Config(scenario=Scenario.SIM_VILLA_ROOM, plot_lvl=PlotLvl.RESULT_ONLY)
 # cfg = Config(scenario=Scenario.SIM_MAZE)
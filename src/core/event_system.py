@@ -12,9 +12,23 @@ def subscribe(topic: Enum, callback_fn: Callable):
     subscriptions[topic].append(callback_fn)
 
 
+def has_subscribers(topic: Enum) -> bool:
+    """so publishers can skip building messages nobody listens to"""
+    return bool(subscriptions.get(topic))
+
+
 def post_event(topic: Enum, message: object):
     if not (topic in subscriptions):
         return
 
     for callback_fn in subscriptions[topic]:
         callback_fn(message)
+
+
+async def post_event_async(topic: Enum, message: object):
+    """like post_event, for subscribers that are coroutine functions, each is awaited in turn"""
+    if not (topic in subscriptions):
+        return
+
+    for callback_fn in subscriptions[topic]:
+        await callback_fn(message)
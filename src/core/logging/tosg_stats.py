@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 import matplotlib.pyplot as plt
 
@@ -13,6 +14,7 @@ from src.shared.situational_graph import SituationalGraph
 @dataclass
 class TOSGStats:
     def __init__(self) -> None:
+        self.steps = [0]
         self.num_nodes = [0]
         self.num_edges = [0]
         self.num_waypoint_nodes = [0]
@@ -28,8 +30,9 @@ class TOSGStats:
     def handle_task_utilities_event(self, task_utilities: dict):
         self.task_utilities.append(task_utilities)
 
-    def update(self, sgraph: SituationalGraph, step_duration):
-
+    def update(self, sgraph: SituationalGraph, step_duration, n_steps: Optional[int] = None):
+        # the stats can be collected less often than every step, n_steps is the number of steps so far
+        self.steps.append(len(self.steps) if n_steps is None else n_steps)
         self.num_nodes.append(sgraph.G.number_of_nodes())
         self.num_edges.append(sgraph.G.number_of_edges())
         self.step_duration.append(step_duration)
@@ -73,9 +76,7 @@ class TOSGStats:
         )
 
     def subplot_step_vs_step_duration(self, ax):
-        ax.step(
-            range(len(self.step_duration)), self.step_duration, label="step duration"
-        )
+        ax.step(self.steps, self.step_duration, label="step duration")
 
         ax.set_title("Step duration vs step")
         ax.set(xlabel="Step", ylabel="Step duration (seconds)")
@@ -85,9 +86,9 @@ class TOSGStats:
         ax.set_title("Step vs size of the KRM")
         ax.set(xlabel="Step", ylabel="# of nodes")
 
-        ax.step(range(len(self.num_nodes)), self.num_nodes, label="Total nodes", c="b")
+        ax.step(self.steps, self.num_nodes, label="Total nodes", c="b")
         ax.step(
-            range(len(self.num_edges)),
+            self.steps,
             self.num_edges,
             label="Total edges",
             linestyle="--",
@@ -95,13 +96,13 @@ class TOSGStats:
         )
 
         ax.step(
-            range(len(self.num_waypoint_nodes)),
+            self.steps,
             self.num_waypoint_nodes,
             label="Waypoint nodes",
             c="r",
         )
         ax.step(
-            range(len(self.num_waypoint_edges)),
+            self.steps,
             self.num_waypoint_edges,
             label="Waypoint edges",
             c="r",
@@ -109,13 +110,13 @@ class TOSGStats:
             linestyle="--",
         )
         ax.step(
-            range(len(self.num_frontier_nodes)),
+            self.steps,
             self.num_frontier_nodes,
             label="Frontier nodes",
             c="g",
         )
         ax.step(
-            range(len(self.num_world_object_nodes)),
+            self.steps,
             self.num_world_object_nodes,
             label="World object nodes",
             c="purple",
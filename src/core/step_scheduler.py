@@ -0,0 +1,51 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from src.config import MissionStage, cfg
+
+
+class StepScheduler:
+    """
+    Decides which stages of a mission step run, so e.g. rendering can run at a few Hz
+    while the simulation steps as fast as it can.
+    A stage is due every STAGE_PERIODS steps, but at most once per STAGE_INTERVALS seconds.
+    A stage with a time budget earns its budget every step and pays for the time it runs,
+    it is not due while in debt, so a slow stage runs less often instead of slowing every step down.
+    Times come from clock, which tests can replace.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._clock = clock
+        self._last_run: dict[MissionStage, float] = {}
+        self._credit: dict[MissionStage, float] = {}
+
+    def is_due(self, stage: MissionStage, step: int) -> bool:
+        """ask once per step and stage, a due stage counts as run"""
+        budget = cfg.STAGE_TIME_BUDGETS.get(stage)
+        if budget is not None:
+            # no saving up while idle, a stage never gets more than one step of budget ahead
+            self._credit[stage] = min(self._credit.get(stage, 0.0) + budget, budget)
+            if self._credit[stage] < 0:
+                return False
+
+        if step % cfg.STAGE_PERIODS.get(stage, 1) != 0:
+            return False
+
+        now = self._clock()
+        last_run = self._last_run.get(stage)
+        if last_run is not None and now - last_run < cfg.STAGE_INTERVALS.get(stage, 0.0):
+            return False
+
+        self._last_run[stage] = now
+        return True
+
+    @contextmanager
+    def timed(self, stage: MissionStage) -> Iterator[None]:
+        """charge the time spent in the block to the budget of the stage"""
+        start = self._clock()
+        try:
+            yield
+        finally:
+            if stage in cfg.STAGE_TIME_BUDGETS:
+                self._credit[stage] = self._credit.get(stage, 0.0) - (self._clock() - start)
@@ -3,9 +3,13 @@ from enum import Enum
 
 class Topics(Enum):
     RUN_PLATFORM = "run platform"
+    RUN_PLATFORM_ASYNC = "run platform async"
+    RUN_PLATFORM_THREADED = "run platform threaded"
 
     OPERATOR_TASK = "operator task"
 
+    SIM__MAP_CHANGED = "sim map changed"
+
     VIEW__SHORTCUT_CHECKING = "shortcut checking data"
     VIEW__FRONTIER_SAMPLING = "frontier sampling data"
     #
@@ -1,9 +1,13 @@
+import asyncio
 import time
+from typing import Optional
 
-from src.config import cfg
+from src.config import MissionStage, PlotLvl, cfg
 from src.core import event_system
+from src.core.step_scheduler import StepScheduler
 from src.core.topics import Topics
 from src.mission_autonomy.mission_initializer import MissionInitializer
+from src.mission_autonomy.shortcut_finder import ShortcutFinder
 from src.mission_autonomy.task_allocator import TaskAllocator
 from src.operator.feedback_pipeline import (
     feedback_pipeline_completion,
@@ -11,7 +15,11 @@ from src.operator.feedback_pipeline import (
     feedback_pipeline_single_step,
 )
 from src.platform_autonomy.control.abstract_agent import AbstractAgent
-from src.platform_autonomy.platform_runner import PlatformRunnerMessage
+from src.platform_autonomy.control.sim.batched_sensing import BatchedSimSensing
+from src.platform_autonomy.platform_runner import (
+    PlatformRunnerBatchMessage,
+    PlatformRunnerMessage,
+)
 from src.shared.situational_graph import SituationalGraph
 from src.shared.task import Task
 
@@ -26,8 +34,13 @@ class MissionRunner:
         self.step = 0
         self.mission_completed = False
         self.operator_task_queue: list[Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # of the async mission
 
         self.task_allocator = TaskAllocator()
+        self.shortcut_finder = ShortcutFinder() if cfg.GLOBAL_SHORTCUTS else None
+        self.batched_sensing = BatchedSimSensing() if cfg.BATCHED_SIM_SENSING else None
+        # the async mode allocates and plans whenever an agent needs it, the other stages are scheduled in all modes
+        self.scheduler = StepScheduler()
         initializer.initialize_mission(agents, situational_graph)
 
         self.start, self.tosg_stats, self.my_logger = feedback_pipeline_init()
@@ -39,9 +52,15 @@ class MissionRunner:
         self, agents: list[AbstractAgent], situational_graph: SituationalGraph
     ):
 
-        """Main Logic Loop"""
+        """
+        Main Logic Loop, keeps the final view up after completion.
+        Headless runs return after completion, or after MAX_STEPS steps.
+        """
         while True:
             while not self.mission_completed:
+                if cfg.PLOT_LVL is PlotLvl.NONE and self.step >= cfg.MAX_STEPS:
+                    break
+
                 self.inner_loop(
                     agents,
                     situational_graph,
@@ -56,8 +75,8 @@ class MissionRunner:
                 self.start,
             )
 
-
-
+            if cfg.PLOT_LVL is PlotLvl.NONE:
+                return
 
     def inner_loop(
         self,
@@ -71,34 +90,190 @@ class MissionRunner:
         if len(self.operator_task_queue) > 0:
             print(f"task queue: {self.operator_task_queue}")
 
-        for agent_idx in range(len(agents)):
-            agent = agents[agent_idx]
+        # the world may have changed since the last step, also around an agent which did not move
+        for agent in agents:
+            agent.invalidate_local_grid()
+
+        if self.batched_sensing:
+            self.batched_sensing.sense(agents, situational_graph)
 
-            if agent.init_explore_step_completed:
-                filtered_situational_graph = situational_graph.get_filtered_graph(agent.capabilities)
+        allocate = self.scheduler.is_due(MissionStage.ALLOCATION, self.step)
+        replan = self.scheduler.is_due(MissionStage.PLANNING, self.step)
 
-                for task in self.operator_task_queue:
-                    if task not in situational_graph.tasks:
-                        situational_graph.tasks.append(task)
+        if cfg.THREADED_PLATFORM:
+            # all agents act at once, so none of them can leave its task to the others within its turn
+            if allocate:
+                with self.scheduler.timed(MissionStage.ALLOCATION):
+                    for agent in agents:
+                        self._allocate_task(agent, agents, situational_graph, exclusive=True)
 
-                # HACK: this if statement does not have correct logic
-                if len(self.operator_task_queue) > 0 and agent.task is None:
-                    """Operator task allocation"""
-                    agent.task = self.operator_task_queue.pop(0)
+            data = PlatformRunnerBatchMessage(agents, situational_graph, replan)
+            event_system.post_event(Topics.RUN_PLATFORM_THREADED, data)
 
-                elif len(self.operator_task_queue) == 0 and agent.task is None:
-                    """Autonomous task allocation"""
-                    agent.task = self.task_allocator.single_agent_task_selection(
-                        agent.at_wp, filtered_situational_graph
-                    )
+            self.mission_completed = situational_graph.check_if_tasks_exhausted()
+            self._finish_step(agents, situational_graph, step_start_time)
+            return
+
+        for agent_idx in range(len(agents)):
+            agent = agents[agent_idx]
+
+            if allocate:
+                with self.scheduler.timed(MissionStage.ALLOCATION):
+                    self._allocate_task(agent, agents, situational_graph)
 
             # if agent.task:
             # print(f"Agent {agent_idx} is executing task {agent.task}")
-            data = PlatformRunnerMessage(agent, situational_graph)
+            data = PlatformRunnerMessage(agent, situational_graph, replan)
             event_system.post_event(Topics.RUN_PLATFORM, data)
 
             self.mission_completed = situational_graph.check_if_tasks_exhausted()
 
+        self._finish_step(agents, situational_graph, step_start_time)
+
+    async def mission_main_loop_async(
+        self, agents: list[AbstractAgent], situational_graph: SituationalGraph
+    ):
+        """
+        Every agent runs as its own task, so a robot that is moving does not hold up the others.
+        Only the moves and sensor reads are awaited, in worker threads. All graph reads and writes happen
+        on the event loop in between, which makes it the single writer of the graph.
+        Returns when no agent has anything left to do, or after MAX_STEPS steps.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._graph_changed = asyncio.Condition()
+        self._graph_generation = 0  # counts the agent steps and operator tasks which changed what there is to do
+        self._idle_since: dict[int, int] = {}  # generation at which each waiting agent found nothing to do
+        self._n_agent_steps = 0
+        self._all_idle = False
+
+        try:
+            await asyncio.gather(
+                *(self._agent_loop_async(agent, agents, situational_graph) for agent in agents)
+            )
+        finally:
+            self._loop = None
+
+        feedback_pipeline_completion(
+            self.step,
+            agents,
+            situational_graph,
+            self.tosg_stats,
+            self.my_logger,
+            self.start,
+        )
+
+    async def _agent_loop_async(
+        self, agent: AbstractAgent, agents: list[AbstractAgent], situational_graph: SituationalGraph
+    ):
+        step_start_time = time.perf_counter()
+        while not self._all_idle and self.step < cfg.MAX_STEPS:
+            generation = self._graph_generation
+            agent.invalidate_local_grid()
+            self._allocate_task(agent, agents, situational_graph, exclusive=True)
+
+            if agent.init_explore_step_completed and agent.task is None:
+                # nothing to do for this agent until the other agents change the graph
+                await self._wait_for_graph_change(agent, generation, len(agents))
+                continue
+
+            work_before = self._work_signature(agent, situational_graph)
+            data = PlatformRunnerMessage(agent, situational_graph)
+            await event_system.post_event_async(Topics.RUN_PLATFORM_ASYNC, data)
+            work_changed = self._work_signature(agent, situational_graph) != work_before
+
+            self.mission_completed = situational_graph.check_if_tasks_exhausted()
+
+            # a step is over when there were as many agent steps as there are agents
+            self._n_agent_steps += 1
+            if self._n_agent_steps % len(agents) == 0:
+                self._finish_step(agents, situational_graph, step_start_time)
+                step_start_time = time.perf_counter()
+
+            if work_changed:
+                await self._notify_graph_changed()
+            else:
+                # e.g. planning failed, a step without a move or sensor read does not yield by itself
+                await asyncio.sleep(0)
+
+        # the waiting agents have to see the mission is over too
+        await self._notify_graph_changed()
+
+    @staticmethod
+    def _work_signature(agent: AbstractAgent, situational_graph: SituationalGraph) -> tuple:
+        """changes when the graph or the tasks change, or the agent drops a task for the others"""
+        return situational_graph.version, len(situational_graph.tasks), agent.task
+
+    async def _notify_graph_changed(self):
+        async with self._graph_changed:
+            self._graph_generation += 1
+            self._graph_changed.notify_all()
+
+    async def _wait_for_graph_change(self, agent: AbstractAgent, generation: int, n_agents: int):
+        """
+        Wait until another agent changed the graph since this agent allocated at generation.
+        The mission is over when all agents are waiting and all of them allocated on the current graph,
+        agents which were woken up but did not get to allocate again still count as busy.
+        """
+        async with self._graph_changed:
+            if generation != self._graph_generation:
+                return
+
+            self._idle_since[id(agent)] = generation
+            if len(self._idle_since) == n_agents and all(
+                idle_since == self._graph_generation for idle_since in self._idle_since.values()
+            ):
+                # nobody is left to change the graph
+                self._all_idle = True
+                self._graph_changed.notify_all()
+            else:
+                await self._graph_changed.wait_for(
+                    lambda: self._all_idle or self._graph_generation != generation
+                )
+            del self._idle_since[id(agent)]
+
+    def _allocate_task(
+        self,
+        agent: AbstractAgent,
+        agents: list[AbstractAgent],
+        situational_graph: SituationalGraph,
+        exclusive: bool = False,
+    ):
+        """
+        Give an idle agent a task. With exclusive allocation the tasks of the other agents are skipped,
+        in the async mode they are still busy with them, while in turns they finish most tasks within their turn.
+        """
+        if agent.init_explore_step_completed:
+            filtered_situational_graph = situational_graph.get_filtered_graph(agent.capabilities)
+
+            for task in self.operator_task_queue:
+                if task not in situational_graph.tasks:
+                    situational_graph.tasks.append(task)
+
+            # HACK: this if statement does not have correct logic
+            if len(self.operator_task_queue) > 0 and agent.task is None:
+                """Operator task allocation"""
+                agent.task = self.operator_task_queue.pop(0)
+
+            elif len(self.operator_task_queue) == 0 and agent.task is None:
+                """Autonomous task allocation"""
+                other_agents = [other for other in agents if other is not agent]
+                agent.task = self.task_allocator.single_agent_task_selection(
+                    agent.at_wp,
+                    filtered_situational_graph,
+                    other_agents,
+                    taken_tasks={other.task for other in other_agents if other.task}
+                    if exclusive
+                    else (),
+                )
+
+    def _finish_step(
+        self, agents: list[AbstractAgent], situational_graph: SituationalGraph, step_start_time: float
+    ):
+        if self.shortcut_finder and self.step % cfg.GLOBAL_SHORTCUT_PERIOD == 0:
+            global_map = next((agent.global_map for agent in agents if agent.global_map), None)
+            if global_map:
+                self.shortcut_finder.find_shortcuts(situational_graph, global_map)
+
         feedback_pipeline_single_step(
             self.step,
             step_start_time,
@@ -106,6 +281,7 @@ class MissionRunner:
             situational_graph,
             self.tosg_stats,
             self.my_logger,
+            self.scheduler,
         )
         self.step += 1
 
@@ -113,3 +289,10 @@ class MissionRunner:
         print(f"Operator task event received: {data}")
         self.operator_task_queue.append(data)
         self.mission_completed = False
+
+        if self._loop is not None:
+            # wake up the waiting agents of the async mission, the event may come from another thread
+            self._all_idle = False
+            self._loop.call_soon_threadsafe(
+                lambda: asyncio.ensure_future(self._notify_graph_changed())
+            )
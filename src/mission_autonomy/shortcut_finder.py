@@ -0,0 +1,121 @@
+import logging
+import math
+
+import networkx as nx
+import numpy as np
+
+from src.config import cfg
+from src.platform_autonomy.state.global_occupancy_map import GlobalOccupancyMap
+from src.shared.prior_knowledge.sar_situations import Situations
+from src.shared.situational_graph import SituationalGraph
+from src.shared.types.node_and_edge import Node
+
+
+class ShortcutFinder:
+    """
+    Looks for shortcuts between any two waypoints on the fused global occupancy map,
+    also between waypoints which were never visited in sequence.
+    Each pass tests a budget of waypoint pairs and continues where the previous pass stopped,
+    so the whole graph is covered over a number of steps.
+    """
+
+    def __init__(self) -> None:
+        self._log = logging.getLogger(__name__)
+        self._waypoints: list[Node] = []
+        self._cursor = 0
+
+    def find_shortcuts(
+        self, situational_graph: SituationalGraph, global_map: GlobalOccupancyMap
+    ) -> int:
+        """test the next batch of waypoint pairs and add GOTO diedges for the free ones, returns how many"""
+        pairs = []
+        pos = []
+        for a, b, a_pos, b_pos in self._next_candidate_pairs(situational_graph, global_map):
+            pairs.append((a, b))
+            pos.append((a_pos, b_pos))
+
+        if not pairs:
+            return 0
+
+        is_free, _ = global_map.are_collision_free_straight_lines(
+            np.array([a_pos for a_pos, _ in pos]),
+            np.array([b_pos for _, b_pos in pos]),
+            robot_radius=cfg.ROBOT_RADIUS,
+        )
+
+        for (a, b), free in zip(pairs, is_free):
+            if free:
+                situational_graph.add_waypoint_diedge(a, b)
+
+        n_added = int(is_free.sum())
+        self._log.debug(f"tested {len(pairs)} waypoint pairs, added {n_added} shortcuts")
+        return n_added
+
+    def _next_candidate_pairs(
+        self, situational_graph: SituationalGraph, global_map: GlobalOccupancyMap
+    ) -> list[tuple[Node, Node, tuple[float, float], tuple[float, float]]]:
+        """
+        Pairs of waypoints within GLOBAL_SHORTCUT_RADIUS which are not connected directly,
+        and whose path through the graph is at least GLOBAL_SHORTCUT_MIN_GAIN times longer than the straight line.
+        Every waypoint searched from and every pair to test costs one unit of GLOBAL_SHORTCUT_BUDGET,
+        pairs which were already tested on the same occupancy are skipped for free.
+        The pass also ends before the waypoints searched from span more than GLOBAL_SHORTCUT_MAX_EXTENT,
+        so the pairs of one pass stay in a small area of the global map.
+        """
+        if self._cursor >= len(self._waypoints):
+            self._waypoints = situational_graph.get_nodes_by_type(Situations.WAYPOINT)
+            self._cursor = 0
+
+        # longer paths than this are long enough for any pair within the radius
+        cutoff = cfg.GLOBAL_SHORTCUT_MIN_GAIN * cfg.GLOBAL_SHORTCUT_RADIUS
+
+        pairs = []
+        budget = cfg.GLOBAL_SHORTCUT_BUDGET
+        pos_min = pos_max = None
+        while self._cursor < len(self._waypoints) and budget > 0:
+            a = self._waypoints[self._cursor]
+            if a not in situational_graph.G:
+                self._cursor += 1
+                continue
+
+            a_pos = np.asarray(situational_graph.get_node_data_by_node(a)["pos"], dtype=float)
+            if pos_min is not None:
+                pos_min, pos_max = np.minimum(pos_min, a_pos), np.maximum(pos_max, a_pos)
+                if (pos_max - pos_min).max() > cfg.GLOBAL_SHORTCUT_MAX_EXTENT:
+                    break
+            else:
+                pos_min = pos_max = a_pos
+            self._cursor += 1
+
+            # a local search which stays out of the distance field cache, those fields are for whole graph queries
+            budget -= 1
+            a_pos = tuple(a_pos)
+            path_costs = nx.single_source_dijkstra_path_length(
+                situational_graph.G, a, cutoff=cutoff, weight="cost"
+            )
+
+            for b in situational_graph.get_nodes_of_type_in_box(
+                a_pos, cfg.GLOBAL_SHORTCUT_RADIUS, Situations.WAYPOINT
+            ):
+                # every pair is seen from both sides, only test it from one
+                if b.int <= a.int or situational_graph.G.has_edge(a, b):
+                    continue
+
+                b_pos = situational_graph.get_node_data_by_node(b)["pos"]
+                dist = math.dist(a_pos, b_pos)
+                if dist > cfg.GLOBAL_SHORTCUT_RADIUS:
+                    continue
+
+                if path_costs.get(b, math.inf) <= cfg.GLOBAL_SHORTCUT_MIN_GAIN * dist:
+                    continue
+
+                # only retest a pair when new sensor data changed the occupancy around it
+                token = global_map.occupancy_token(a_pos, b_pos, cfg.ROBOT_RADIUS)
+                if situational_graph.is_shortcut_tested(a, b, token):
+                    continue
+                situational_graph.mark_shortcut_tested(a, b, token)
+
+                pairs.append((a, b, a_pos, b_pos))
+                budget -= 1
+
+        return pairs
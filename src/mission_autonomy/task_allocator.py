@@ -1,10 +1,14 @@
-from typing import Optional
-
-import networkx as nx
+import heapq
+from itertools import count
+from typing import Collection, Optional, Sequence
 
+from src.config import UtilityMode, cfg
 from src.core import event_system as event_system
 from src.core.topics import Topics
+from src.platform_autonomy.control.abstract_agent import AbstractAgent
+from src.shared.prior_knowledge.sar_situations import Situations
 from src.shared.situational_graph import SituationalGraph
+from src.shared.spatial_hash import SpatialHash
 from src.shared.task import Task
 from src.shared.types.node_and_edge import Node
 
@@ -13,17 +17,56 @@ class TaskAllocator:
     """
     Naive task allocator that selects the task with the highest utility.
     Multiple agents can be assigned to the same task.
+    In dispersion mode frontiers close to the other agents are discounted to spread them out.
+    With TASK_PREFILTER only the tasks near the agent and the high reward tasks are evaluated.
     """
 
     def single_agent_task_selection(
-        self, agent_at_wp: Node, situational_graph: SituationalGraph
+        self,
+        agent_at_wp: Node,
+        situational_graph: SituationalGraph,
+        other_agents: Sequence[AbstractAgent] = (),
+        taken_tasks: Collection[Task] = (),
     ) -> Optional[Task]:
-        target_node_to_task = {task.edge[1]: task for task in situational_graph.tasks}
+        """the task with the highest utility, tasks in taken_tasks are left for the agents busy with them"""
+        task_to_utility = None
+        if cfg.TASK_PREFILTER:
+            task_to_utility = self._prefiltered_task_utilities(
+                agent_at_wp, situational_graph, other_agents
+            )
+            # the prefilter bound only holds for the best task, if that is taken search everything
+            if task_to_utility and any(task in task_to_utility for task in taken_tasks):
+                task_to_utility = None
 
-        path_costs = self.distance_and_path_dijkstra(
-            situational_graph, agent_at_wp, set(target_node_to_task.keys())
-        )
+        if task_to_utility is None:
+            target_node_to_task = {
+                task.edge[1]: task for task in situational_graph.tasks
+            }
+
+            path_costs = self.distance_and_path_dijkstra(
+                situational_graph, agent_at_wp, set(target_node_to_task.keys())
+            )
+            task_to_utility = self._calc_task_utilities(
+                situational_graph.tasks, path_costs, situational_graph, other_agents
+            )
+
+        for task in taken_tasks:
+            task_to_utility.pop(task, None)
 
+        event_system.post_event(Topics.LOG__TASK_UTILITIES, task_to_utility)
+
+        if len(task_to_utility) == 0:
+            return None
+
+        return max(task_to_utility, key=lambda task: task_to_utility[task])
+
+    def _calc_task_utilities(
+        self,
+        tasks: Sequence[Task],
+        path_costs: dict[Node, float],
+        situational_graph: SituationalGraph,
+        other_agents: Sequence[AbstractAgent],
+    ) -> dict[Task, float]:
         def calc_utility(reward: float, path_cost: float) -> float:
             if path_cost == 0:
                 return float("inf")
@@ -32,32 +75,164 @@ class TaskAllocator:
 
         task_to_utility = {
             task: calc_utility(task.reward, path_costs[task.edge[1]])
-            for task in situational_graph.tasks
+            for task in tasks
             if task.edge[1] in path_costs
         }
 
-        event_system.post_event(Topics.LOG__TASK_UTILITIES, task_to_utility)
+        if cfg.UTILITY_MODE is UtilityMode.DISPERSION and other_agents:
+            self._apply_dispersion_penalty(
+                task_to_utility, situational_graph, other_agents
+            )
 
-        if len(task_to_utility) == 0:
+        return task_to_utility
+
+    def _prefiltered_task_utilities(
+        self,
+        agent_at_wp: Node,
+        situational_graph: SituationalGraph,
+        other_agents: Sequence[AbstractAgent],
+    ) -> Optional[dict[Task, float]]:
+        """
+        Only calculate the utility of the TASK_PREFILTER_K tasks closest to the agent and
+        of all high reward tasks. Their path costs come from the cached distance field of the
+        agent waypoint, or else from a search which stops once their targets are reached.
+        Edge costs are euclidean lengths, so the euclidean distance to a task is a lower
+        bound on its path cost. If that bound cannot rule out a better task outside the
+        candidates we return None, and the caller falls back to evaluating every task.
+        """
+        agent_pos = situational_graph.get_node_data_by_node(agent_at_wp)["pos"]
+
+        task_positions = SpatialHash(cfg.LG_LEN_IN_M)
+        for task in situational_graph.tasks:
+            if situational_graph.G.has_node(task.edge[1]):
+                task_positions.insert(
+                    task, situational_graph.get_node_data_by_node(task.edge[1])["pos"]
+                )
+
+        nearest = task_positions.nearest(agent_pos, cfg.TASK_PREFILTER_K)
+        candidates = {task for task, _ in nearest}
+        candidates.update(
+            task
+            for task in situational_graph.tasks
+            if task.reward >= cfg.TASK_PREFILTER_HIGH_REWARD
+        )
+        # keep the order of the task list, so ties are broken as without the prefilter
+        candidate_tasks = [task for task in situational_graph.tasks if task in candidates]
+
+        cached_field = situational_graph.lookup_distance_field(agent_at_wp)
+        if cached_field is not None:
+            path_costs = cached_field.distance
+        else:
+            path_costs = self._bounded_dijkstra(
+                situational_graph,
+                agent_at_wp,
+                {task.edge[1] for task in candidate_tasks},
+            )
+        task_to_utility = self._calc_task_utilities(
+            candidate_tasks, path_costs, situational_graph, other_agents
+        )
+
+        other_tasks = [
+            task
+            for task in situational_graph.tasks
+            if task not in candidates and task in task_positions
+        ]
+        if not other_tasks:
+            return task_to_utility
+        if not task_to_utility:
             return None
 
-        return max(task_to_utility, key=lambda task: task_to_utility[task])
+        # none of the other tasks is closer than the furthest of the k nearest
+        min_dist_of_other_tasks = nearest[-1][1]
+        if min_dist_of_other_tasks == 0:
+            return None
+        max_utility_of_other_tasks = (
+            max(task.reward for task in other_tasks) / min_dist_of_other_tasks
+        )
+
+        if max(task_to_utility.values()) <= max_utility_of_other_tasks:
+            return None
+
+        return task_to_utility
+
+    @staticmethod
+    def _bounded_dijkstra(
+        situational_graph: SituationalGraph, source: Node, targets: set[Node]
+    ) -> dict[Node, float]:
+        """
+        Dijkstra from source over the edge costs, which stops as soon as all targets are settled.
+        Returns the path cost of every settled node, unreachable targets are left out.
+        """
+        remaining_targets = set(targets)
+        path_costs: dict[Node, float] = {}
+        best_known = {source: 0.0}
+        tiebreak = count()  # avoids comparing nodes when costs are equal
+        queue = [(0.0, next(tiebreak), source)]
+
+        while queue and remaining_targets:
+            cost, _, node = heapq.heappop(queue)
+            if node in path_costs:
+                continue
+
+            path_costs[node] = cost
+            remaining_targets.discard(node)
+
+            for neighbor, parallel_edges in situational_graph.G.succ[node].items():
+                if neighbor in path_costs or not parallel_edges:
+                    continue
+
+                new_cost = cost + min(data["cost"] for data in parallel_edges.values())
+                if new_cost < best_known.get(neighbor, float("inf")):
+                    best_known[neighbor] = new_cost
+                    heapq.heappush(queue, (new_cost, next(tiebreak), neighbor))
+
+        return path_costs
+
+    @staticmethod
+    def _apply_dispersion_penalty(
+        task_to_utility: dict[Task, float],
+        situational_graph: SituationalGraph,
+        other_agents: Sequence[AbstractAgent],
+    ) -> None:
+        """
+        Discount the utility of frontier tasks within DISPERSION_RADIUS of the positions
+        and task targets of other agents, the closer the frontier the larger the discount.
+        """
+        radius = cfg.DISPERSION_RADIUS
+
+        # bucket size equal to the radius means a query visits at most 3x3 buckets
+        claimed_positions = SpatialHash(radius)
+        for idx, pos in enumerate(
+            TaskAllocator._claimed_positions(situational_graph, other_agents)
+        ):
+            claimed_positions.insert(idx, pos)
+
+        for task in task_to_utility:
+            target_data = situational_graph.get_node_data_by_node(task.edge[1])
+            if target_data["type"] is not Situations.FRONTIER:
+                continue
+
+            for _, dist in claimed_positions.query_radius(target_data["pos"], radius):
+                task_to_utility[task] *= 1 - cfg.DISPERSION_PENALTY * (1 - dist / radius)
+
+    @staticmethod
+    def _claimed_positions(
+        situational_graph: SituationalGraph, agents: Sequence[AbstractAgent]
+    ) -> list[tuple[float, float]]:
+        """The current positions of the agents and the targets of their tasks."""
+        positions = []
+        for agent in agents:
+            positions.append(agent.pos)
+            if agent.task and situational_graph.G.has_node(agent.task.edge[1]):
+                positions.append(
+                    situational_graph.get_node_data_by_node(agent.task.edge[1])["pos"]
+                )
+
+        return positions
 
     # TODO: move to task allocator
     def distance_and_path_dijkstra(
         self, situational_graph: SituationalGraph, source: Node, targets: set[Node]
     ) -> dict[Node, float]:
         """returns the length of the shortest path between a single source and multiple targets"""
-        try:
-            distance, _ = nx.single_source_dijkstra(
-                situational_graph.G,
-                source=source,
-                weight="cost",
-            )
-        except nx.NetworkXNoPath:
-            situational_graph._log.debug(
-                f"shortest_path_len: No path found from {source} to {targets}."
-            )
-            distance = {target: float("inf") for target in targets}
-
-        return distance
+        return situational_graph.get_distance_field(source).distance
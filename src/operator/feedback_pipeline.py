@@ -2,10 +2,11 @@ import logging
 import time
 from dataclasses import dataclass
 
-from src.config import cfg
+from src.config import MissionStage, cfg
 from src.core import event_system
 from src.core.topics import Topics
 from src.core.logging.tosg_stats import TOSGStats
+from src.core.step_scheduler import StepScheduler
 from src.platform_autonomy.control.abstract_agent import AbstractAgent
 from src.platform_autonomy.control.audio_feedback import play_file
 from src.shared.situational_graph import SituationalGraph
@@ -31,21 +32,27 @@ def feedback_pipeline_init():
 
 
 def feedback_pipeline_single_step(
-    step, step_start, agents, situational_graph, tosg_stats, my_logger
+    step, step_start, agents, situational_graph, tosg_stats, my_logger, scheduler: StepScheduler
 ):
     """Data collection"""
     step_duration = time.perf_counter() - step_start
-    tosg_stats.update(situational_graph, step_duration)
+    if scheduler.is_due(MissionStage.STATS, step):
+        with scheduler.timed(MissionStage.STATS):
+            tosg_stats.update(situational_graph, step_duration, step + 1)
 
     """ Visualisation """
     my_logger.debug(f"{step} ------------------------ {step_duration:.4f}s")
 
-    event_system.post_event(
-        Topics.VIEW__MISSION_UPDATE,
-        MissionViewModel(situational_graph=situational_graph, agents=agents),
-    )
+    if scheduler.is_due(MissionStage.RENDERING, step) and event_system.has_subscribers(
+        Topics.VIEW__MISSION_UPDATE
+    ):
+        with scheduler.timed(MissionStage.RENDERING):
+            event_system.post_event(
+                Topics.VIEW__MISSION_UPDATE,
+                MissionViewModel(situational_graph=situational_graph, agents=agents),
+            )
 
-    if step % 50 == 0:
+    if scheduler.is_due(MissionStage.INFO_LOG, step):
         s = f"sim step = {step} took {step_duration:.4f}s, with {agents[0].steps_taken} move actions"
         my_logger.info(s)
 
@@ -71,10 +78,11 @@ def feedback_pipeline_completion(
     # if cfg.AUDIO_FEEDBACK:
     #     play_file("exploration_complete.mp3")
 
-    event_system.post_event(
-        Topics.VIEW__MISSION_UPDATE_FINAL,
-        MissionViewModel(situational_graph=situational_graph, agents=agents),
-    )
+    if event_system.has_subscribers(Topics.VIEW__MISSION_UPDATE_FINAL):
+        event_system.post_event(
+            Topics.VIEW__MISSION_UPDATE_FINAL,
+            MissionViewModel(situational_graph=situational_graph, agents=agents),
+        )
 
     # if cfg.PLOT_LVL <= PlotLvl.STATS_ONLY:
     #     tosg_stats.plot_krm_stats()
@@ -1,10 +1,15 @@
-from src.operator.views.frontier_sampling_view import FrontierSamplingDebugView
-from src.operator.views.mission_view import MissionView
-from src.operator.views.waypoint_shortcuts_view import WaypointShortcutDebugView
+from src.config import PlotLvl, cfg
 
 
 def run():
-    """initiliaze view subscribers"""
+    """initiliaze view subscribers, headless runs get none and do not import vedo at all"""
+    if cfg.PLOT_LVL is PlotLvl.NONE:
+        return
+
+    from src.operator.views.frontier_sampling_view import FrontierSamplingDebugView
+    from src.operator.views.mission_view import MissionView
+    from src.operator.views.waypoint_shortcuts_view import WaypointShortcutDebugView
+
     MissionView()
     WaypointShortcutDebugView()
     FrontierSamplingDebugView()
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from abc import ABC, abstractmethod
 from enum import Enum
@@ -7,6 +8,7 @@ import numpy as np
 import numpy.typing as npt
 
 from src.config import cfg
+from src.platform_autonomy.state.global_occupancy_map import GlobalOccupancyMap
 from src.platform_autonomy.state.local_grid import LocalGrid
 from src.shared.plan import Plan
 from src.shared.task import Task
@@ -39,6 +41,15 @@ class AbstractAgent(ABC):
         self.algo_iterations = 0
         self._log = logging.getLogger(__name__)
 
+        # the sensor epoch goes up whenever the surroundings might have changed, when the agent moves
+        # and at every mission step, until then repeated requests at the same pose reuse the decoded local grid
+        self._sensor_epoch = 0
+        self._local_grid_cache: Optional[tuple[tuple, LocalGrid]] = None
+        # a grid sensed ahead of time for the pose and the sensor epoch the agent is expected to sense at next
+        self._primed_local_grid: Optional[tuple[int, LocalGrid]] = None
+        # every fresh local grid is fused into this map, if the agent has one
+        self.global_map: Optional[GlobalOccupancyMap] = None
+
         self.__post_init__()
 
     @abstractmethod
@@ -54,15 +65,76 @@ class AbstractAgent(ABC):
             return None
 
     def get_local_grid(self) -> LocalGrid:
+        xy = self.get_localization()
+        cache_key = (tuple(xy), self._sensor_epoch)
+        lg = self._known_local_grid(cache_key)
+        if lg is not None:
+            return lg
+
         lg_img = self._get_local_grid_img()
         # save_something(lg_img, "lg_img")
-        lg = LocalGrid(
-            xy=self.get_localization(),
-            img_data=lg_img,
-        )
+        return self._store_local_grid(cache_key, LocalGrid(xy=xy, img_data=lg_img))
+
+    async def get_local_grid_async(self) -> LocalGrid:
+        """get_local_grid with the sensor read in a worker thread, so other agents keep going meanwhile"""
+        xy = self.get_localization()
+        cache_key = (tuple(xy), self._sensor_epoch)
+        lg = self._known_local_grid(cache_key)
+        if lg is not None:
+            return lg
+
+        lg_img = await asyncio.to_thread(self._get_local_grid_img)
+        return self._store_local_grid(cache_key, LocalGrid(xy=xy, img_data=lg_img))
+
+    def _known_local_grid(self, cache_key: tuple) -> Optional[LocalGrid]:
+        """the cached grid, or the primed one if it was sensed at this pose, None if the sensor has to be read"""
+        if self._local_grid_cache and self._local_grid_cache[0] == cache_key:
+            return self._local_grid_cache[1]
 
+        if self._primed_local_grid is None:
+            return None
+
+        primed_epoch, primed = self._primed_local_grid
+        if primed_epoch == cache_key[1] and tuple(primed.lg_xy) == cache_key[0]:
+            self._primed_local_grid = None
+            return self._store_local_grid(cache_key, primed)
+
+        return None
+
+    def read_local_grid(self) -> LocalGrid:
+        """
+        A freshly sensed and decoded local grid at the current pose, past the cache and the global map,
+        so it can be read off the main thread. Prime it to have get_local_grid use it.
+        """
+        lg = LocalGrid(xy=self.get_localization(), img_data=self._get_local_grid_img())
+        lg.occupied  # decoded on the calling thread
         return lg
 
+    def _store_local_grid(self, cache_key: tuple, lg: LocalGrid) -> LocalGrid:
+        self._local_grid_cache = (cache_key, lg)
+        if self.global_map is not None:
+            self.global_map.fuse(lg)
+
+        return lg
+
+    def prime_local_grid(self, local_grid: Optional[LocalGrid], after_move: bool = False) -> None:
+        """
+        Hand over a grid sensed ahead of time, get_local_grid uses it if the agent is at its pose
+        in the current sensor epoch, or in the one after the next move with after_move.
+        It is dropped once the sensor epoch moves past that, like any other sensed grid.
+        """
+        if local_grid is None:
+            self._primed_local_grid = None
+        else:
+            self._primed_local_grid = (self._sensor_epoch + int(after_move), local_grid)
+
+    def invalidate_local_grid(self) -> None:
+        """force the next get_local_grid to read the sensor again"""
+        self._sensor_epoch += 1
+        self._local_grid_cache = None
+        if self._primed_local_grid is not None and self._primed_local_grid[0] < self._sensor_epoch:
+            self._primed_local_grid = None
+
     @abstractmethod
     def _get_local_grid_img(self) -> npt.NDArray:
         pass
@@ -94,6 +166,7 @@ class AbstractAgent(ABC):
         # BUG: previous_pos never changes
         self.previous_pos = self.get_localization()
         # print(f"self previous pos: {self.previous_pos}")
+        self.invalidate_local_grid()
 
         self._move_to_pos_implementation(target_pos, target_heading)
 
@@ -121,6 +194,12 @@ class AbstractAgent(ABC):
             self.pos = self.get_localization()  # dont make sense for sim agent.
             return False
 
+    async def move_to_pos_async(
+        self, target_pos: tuple[float, float], heading: float = None
+    ) -> bool:
+        """move_to_pos in a worker thread, a real move blocks for seconds"""
+        return await asyncio.to_thread(self.move_to_pos, target_pos, heading)
+
     def calc_heading_to_target(self, target_pos: tuple[float, float]) -> float:
         """
         Calculate the heading to the target.
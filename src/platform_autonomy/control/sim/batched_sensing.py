@@ -0,0 +1,97 @@
+import logging
+from typing import Optional
+
+from src.config import cfg
+from src.platform_autonomy.control.abstract_agent import AbstractAgent
+from src.platform_autonomy.control.sim.simulated_agent import SimulatedAgent
+from src.platform_autonomy.state.frontier_sampling_strategies import (
+    create_frontier_sampling_strategy,
+)
+from src.platform_autonomy.state.local_grid import (
+    DEFAULT_OCCUPANCY_DECODER,
+    OCCUPANCY_DECODERS,
+    LocalGrid,
+)
+from src.shared.prior_knowledge.sar_behaviors import Behaviors
+from src.shared.situational_graph import SituationalGraph
+
+
+class BatchedSimSensing:
+    """
+    Senses for all simulated agents at once, at the poses they are expected to sense at during the step:
+    one gather of all their windows from the map decoded once, stacked in (A, H, W),
+    and one ray check for the frontier sampling of all exploring agents.
+    The grids are primed on the agents and the samplings in the sampling cache,
+    an agent that ends up somewhere else just senses the normal way.
+    """
+
+    def __init__(self) -> None:
+        self._log = logging.getLogger(__name__)
+        self.n_primed = 0
+
+    def sense(self, agents: list[AbstractAgent], situational_graph: SituationalGraph) -> None:
+        sim_agents, poses, exploring, moving = [], [], [], []
+        for agent in agents:
+            if not isinstance(agent, SimulatedAgent):
+                continue
+
+            prediction = self._predict_sensing(agent, situational_graph)
+            if prediction is None:
+                continue
+
+            sim_agents.append(agent)
+            poses.append(prediction[0])
+            exploring.append(prediction[1])
+            moving.append(prediction[2])
+
+        if not sim_agents:
+            return
+
+        # all sim agents load the same map
+        decoder = OCCUPANCY_DECODERS.get(cfg.SCENARIO, DEFAULT_OCCUPANCY_DECODER)
+        occupied, inside = sim_agents[0].lg_spoofer.sim_spoof_occupancy_grids_from_img_world(
+            poses, decoder
+        )
+
+        exploring_grids = []
+        for idx, agent in enumerate(sim_agents):
+            if not inside[idx]:
+                continue
+
+            local_grid = LocalGrid(
+                poses[idx],
+                agent.lg_spoofer.sim_spoof_local_grid_from_img_world(poses[idx]),
+                occupancy_decoder=lambda _, grid_occupied=occupied[idx]: grid_occupied,
+            )
+            agent.prime_local_grid(local_grid, after_move=moving[idx])
+            self.n_primed += 1
+            if exploring[idx]:
+                exploring_grids.append(local_grid)
+
+        create_frontier_sampling_strategy().prime_sampling_cache(exploring_grids)
+
+    @staticmethod
+    def _predict_sensing(
+        agent: AbstractAgent, situational_graph: SituationalGraph
+    ) -> Optional[tuple[tuple[float, float], bool, bool]]:
+        """
+        Where the agent will sense during the next step, whether it samples frontiers there
+        and whether it moves there first, following the next edge of its current plan.
+        None if it will not sense or we cannot tell.
+        """
+        if not agent.init_explore_step_completed:
+            return agent.get_localization(), True, False
+
+        if not agent.plan or len(agent.plan) == 0:
+            return None
+
+        edge = agent.plan.upcoming_edge
+        if edge not in situational_graph.G.edges:
+            return None
+
+        behavior = situational_graph.get_behavior_of_edge(edge)
+        if behavior not in (Behaviors.EXPLORE, Behaviors.GOTO):
+            return None
+
+        target_pos = situational_graph.get_node_data_by_node(edge[1])["pos"]
+        return target_pos, behavior == Behaviors.EXPLORE, True
@@ -1,5 +1,11 @@
+import time
+import weakref
+
 import numpy.typing as npt
 
+from src.config import cfg
+from src.core.event_system import subscribe
+from src.core.topics import Topics
 from src.platform_autonomy.control.abstract_agent import AbstractAgent
 from src.platform_autonomy.control.sim.spoofers.local_grid_image_spoofer import LocalGridImageSpoofer
 from src.platform_autonomy.control.sim.spoofers.world_object_spoofer import WorldObjectSpoofer
@@ -12,6 +18,12 @@ class SimulatedAgent(AbstractAgent):
     def __post_init__(self) -> None:
         self.lg_spoofer = LocalGridImageSpoofer()
         self.world_object_spoofer = WorldObjectSpoofer()
+        _live_agents.add(self)
+
+    def _forget_sensed_grids(self) -> None:
+        """grids sensed or primed on the old map would be reused at the same pose"""
+        self.prime_local_grid(None)
+        self.invalidate_local_grid()
 
     def _get_local_grid_img(self) -> npt.NDArray:
         spoofed_local_grid_img = self.lg_spoofer.sim_spoof_local_grid_from_img_world(self.pos)
@@ -32,8 +44,22 @@ class SimulatedAgent(AbstractAgent):
         :param pos: the position of the agent
         :return: None
         """
+        if cfg.SIM_MOVE_DURATION > 0:
+            time.sleep(cfg.SIM_MOVE_DURATION)
         self.pos = pos  # teleport
 
     def look_for_world_objects_in_perception_scene(self) -> list[WorldObject]:
         w_os = self.world_object_spoofer.spoof_world_objects_from_position(self.pos)
         return w_os
+
+
+# one subscription for all agents, so agents which are gone are not kept alive by it
+_live_agents: "weakref.WeakSet[SimulatedAgent]" = weakref.WeakSet()
+
+
+def _handle_map_changed_event(new_map_path: str) -> None:
+    for agent in list(_live_agents):
+        agent._forget_sensed_grids()
+
+
+subscribe(Topics.SIM__MAP_CHANGED, _handle_map_changed_event)
@@ -1,11 +1,14 @@
 import math
 from dataclasses import dataclass
+from typing import Callable, Optional
 
 import numpy as np
 import numpy.typing as npt
 from PIL import Image
 
 from src.config import cfg
+from src.core.event_system import post_event
+from src.core.topics import Topics
 
 
 @dataclass
@@ -18,10 +21,17 @@ class ImageMapViewModel:
 
 class LocalGridImageSpoofer:
     def __init__(self) -> None:
-        self.set_map(cfg.MAP_PATH)
+        # every agent gets a spoofer, loading the initial map is not a change of the map
+        self._load_map(cfg.MAP_PATH)
 
     def set_map(self, new_map_path: str) -> None:
-        self.map_img = np.asarray(Image.open(new_map_path))
+        self._load_map(new_map_path)
+        # everything derived from the old map is stale now
+        post_event(Topics.SIM__MAP_CHANGED, new_map_path)
+
+    def _load_map(self, map_path: str) -> None:
+        self.map_img = np.asarray(Image.open(map_path))
+        self._decoded_map: Optional[tuple[Callable, npt.NDArray]] = None
 
     def world_coord2global_pix_idx(
         self,
@@ -66,3 +76,28 @@ class LocalGridImageSpoofer:
         ]
 
         return local_grid_img
+
+    def sim_spoof_occupancy_grids_from_img_world(
+        self, agent_poses: list[tuple[float, float]], decoder: Callable[[npt.NDArray], npt.NDArray]
+    ) -> tuple[npt.NDArray[np.bool_], npt.NDArray[np.bool_]]:
+        """
+        The decoded occupancy of the local grids of many poses, stacked in one (A, H, W) array,
+        and which of the windows lie inside the map. The map is decoded once, as decoders work per pixel.
+        Windows sticking out of the map are shifted inside, sim_spoof_local_grid_from_img_world cuts those off instead.
+        """
+        if self._decoded_map is None or self._decoded_map[0] is not decoder:
+            self._decoded_map = (decoder, decoder(self.map_img))
+        map_occupied = self._decoded_map[1]
+
+        LG_SIZE_IN_PIX = 2 * (cfg.LG_NUM_CELLS // 2)
+        rcs = np.array([self.world_coord2global_pix_idx(x, y) for x, y in agent_poses]).reshape(-1, 2)
+        corners = rcs - LG_SIZE_IN_PIX // 2
+
+        max_corner = np.array(map_occupied.shape) - LG_SIZE_IN_PIX
+        inside = np.all((corners >= 0) & (corners <= max_corner), axis=1)
+        corners = np.clip(corners, 0, max_corner)
+
+        windows = np.lib.stride_tricks.sliding_window_view(
+            map_occupied, (LG_SIZE_IN_PIX, LG_SIZE_IN_PIX)
+        )
+        return windows[corners[:, 0], corners[:, 1]], inside
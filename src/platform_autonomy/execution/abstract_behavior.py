@@ -3,6 +3,8 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Sequence
 
+import numpy as np
+
 from src.config import cfg
 from src.platform_autonomy.control.abstract_agent import AbstractAgent
 from src.shared.prior_knowledge.affordance import Affordance
@@ -28,9 +30,50 @@ class AbstractBehavior(ABC):
 
         result = self._run_behavior_implementation(agent, situational_graph, behavior_edge)
 
+        return self.conclude(agent, situational_graph, result, behavior_edge)
+
+    async def pipeline_async(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge: Edge
+    ) -> BehaviorResult:
+        """
+        The pipeline for the async mission mode. Only the moves and sensor reads of the behavior are awaited,
+        the graph is read and mutated in between on the event loop, so it has a single writer.
+        """
+        result = await self._run_behavior_implementation_async(agent, situational_graph, behavior_edge)
+
+        return self.conclude(agent, situational_graph, result, behavior_edge)
+
+    def can_run_threaded(self, agent: AbstractAgent) -> bool:
+        """whether run_threaded leaves the graph alone for this agent"""
+        return True
+
+    def run_threaded(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge: Edge
+    ) -> BehaviorResult:
+        """
+        The first half of the pipeline for the threaded platform runner, on a worker thread next to the other agents.
+        It may read the graph but not write it, conclude does the writes afterwards.
+        """
+        return self._run_behavior_implementation_threaded(agent, situational_graph, behavior_edge)
+
+    def conclude(
+        self,
+        agent: AbstractAgent,
+        situational_graph: SituationalGraph,
+        result: BehaviorResult,
+        behavior_edge: Edge,
+    ) -> BehaviorResult:
+        """check the postconditions of a successful run and mutate the graph accordingly"""
         if not result.success:
             return result
 
+        if behavior_edge not in situational_graph.G.edges:
+            # in the async and threaded modes other agents may have mutated the graph while this one was moving,
+            # e.g. pruned the frontier it went to
+            self._log.warning(f"{agent.name}: {behavior_edge} was removed during the behavior")
+            self._relocalize_after_removed_edge(agent, situational_graph, behavior_edge)
+            return BehaviorResult(False)
+
         if self._check_postconditions(agent, situational_graph, result, behavior_edge):
             self._log.debug(f"postconditions satisfied")
             # TODO: make it actually mutate tasks
@@ -44,12 +87,61 @@ class AbstractBehavior(ABC):
 
         return result
 
+    def _relocalize_after_removed_edge(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge: Edge
+    ) -> None:
+        """
+        The agent stands where the removed edge led, which need not be close to a waypoint.
+        Add a waypoint there if it has line of sight to the waypoint it came from, otherwise go back to that one.
+        """
+        pos = agent.get_localization()
+        close_wps = situational_graph.get_nodes_of_type_in_box(
+            pos, cfg.AT_WP_MARGIN, Situations.WAYPOINT
+        )
+        if close_wps:
+            agent.at_wp = close_wps[0]
+            return
+
+        from_wp = behavior_edge[0]
+        if from_wp not in situational_graph.G:
+            from_wp = situational_graph.get_closest_waypoint_to_pos(pos)
+        from_wp_pos = situational_graph.get_node_data_by_node(from_wp)["pos"]
+
+        lg = agent.get_local_grid()
+        from_wp_cells, on_lg = lg.xy2rc_many(np.array([from_wp_pos], dtype=float))
+        if on_lg[0]:
+            agent_at_rc = lg.LG_LEN_IN_N_CELLS // 2, lg.LG_LEN_IN_N_CELLS // 2
+            is_free, _ = lg.are_collision_free_straight_lines_between_cells(
+                np.array([agent_at_rc]), from_wp_cells, robot_radius=cfg.ROBOT_RADIUS
+            )
+            if is_free[0]:
+                new_wp = situational_graph.add_node_of_type(pos, Situations.WAYPOINT)
+                situational_graph.add_waypoint_diedge(new_wp, from_wp)
+                agent.at_wp = new_wp
+                return
+
+        self._log.warning(f"{agent.name}: moving back to {from_wp_pos}")
+        agent.move_to_pos(from_wp_pos)
+        agent.at_wp = situational_graph.get_closest_waypoint_to_pos(agent.get_localization())
+
     @abstractmethod
     def _run_behavior_implementation(
         self, agent, situational_graph: SituationalGraph, behavior_edge: Edge
     ) -> BehaviorResult:
         pass
 
+    async def _run_behavior_implementation_async(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge: Edge
+    ) -> BehaviorResult:
+        """behaviors that move the agent or read its sensors override this to await those"""
+        return self._run_behavior_implementation(agent, situational_graph, behavior_edge)
+
+    def _run_behavior_implementation_threaded(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge: Edge
+    ) -> BehaviorResult:
+        """behaviors can also sense and cast rays here, for their graph mutation to pick up"""
+        return self._run_behavior_implementation(agent, situational_graph, behavior_edge)
+
     @abstractmethod
     def _check_postconditions(
         self,
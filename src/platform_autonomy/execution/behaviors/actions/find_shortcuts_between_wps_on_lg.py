@@ -1,7 +1,9 @@
 from dataclasses import dataclass
 
+import numpy as np
+
 from src.config import cfg
-from src.core.event_system import post_event
+from src.core.event_system import has_subscribers, post_event
 from src.core.topics import Topics
 from src.platform_autonomy.control.abstract_agent import AbstractAgent
 from src.platform_autonomy.state.local_grid import LocalGrid
@@ -27,42 +29,54 @@ def add_shortcut_edges_between_wps_on_lg(
     close_nodes = situational_graph.get_nodes_of_type_in_margin(
         lg.lg_xy, cfg.WP_SHORTCUT_MARGIN, Situations.WAYPOINT
     )
-    wp_positions_to_shortcut_to_candidates = []
+    candidate_nodes = [
+        node
+        for node in close_nodes
+        if node != agent.at_wp and not situational_graph.G.has_edge(agent.at_wp, node)
+    ]
     shortcut_candidate_cells = []
-    for node in close_nodes:
-        if node != agent.at_wp:
-            wp_positions_to_shortcut_to_candidates.append(
-                situational_graph.get_node_data_by_node(node)["pos"]
-            )
-
     agent_at_rc = lg.LG_LEN_IN_N_CELLS // 2, lg.LG_LEN_IN_N_CELLS // 2
 
-    if wp_positions_to_shortcut_to_candidates:
-        for wp_pos in wp_positions_to_shortcut_to_candidates:
-
-            to_cell = lg.xy2rc(wp_pos)
-            shortcut_candidate_cells.append(to_cell)
+    if candidate_nodes:
+        to_cells, on_lg = lg.xy2rc_many(
+            np.array([situational_graph.get_node_data_by_node(node)["pos"] for node in candidate_nodes])
+        )
+        candidate_nodes = [node for node, is_on_lg in zip(candidate_nodes, on_lg) if is_on_lg]
+        to_cells = to_cells[on_lg]
 
-            (
-                is_collision_free,
-                collision_point,
-            ) = lg.is_collision_free_straight_line_between_cells(agent_at_rc, to_cell)
-            # I think this function might be messing it up
+        # only retest a shortcut when the occupancy along its corridor differs from the previous test
+        corridor_digests = lg.corridor_digests(
+            np.tile(agent_at_rc, (len(to_cells), 1)), to_cells, robot_radius=cfg.ROBOT_RADIUS
+        )
+        untested = []
+        for node, digest in zip(candidate_nodes, corridor_digests):
+            untested.append(not situational_graph.is_shortcut_tested(agent.at_wp, node, digest))
+            situational_graph.mark_shortcut_tested(agent.at_wp, node, digest)
+        candidate_nodes = [node for node, is_untested in zip(candidate_nodes, untested) if is_untested]
+        to_cells = to_cells[np.array(untested, dtype=bool)]
 
-            if collision_point:
-                collision_cell = lg.xy2rc(collision_point)
-                collision_cells.append(collision_cell)
+    if candidate_nodes:
+        shortcut_candidate_cells = [(int(r), int(c)) for r, c in to_cells]
+        (
+            is_collision_free,
+            first_collision_cells,
+        ) = lg.are_collision_free_straight_lines_between_cells(
+            np.tile(agent_at_rc, (len(shortcut_candidate_cells), 1)),
+            to_cells,
+            robot_radius=cfg.ROBOT_RADIUS,
+        )
+        collision_cells = [
+            (int(r), int(c)) for r, c in first_collision_cells[~is_collision_free]
+        ]
 
-            if is_collision_free:
-                from_wp = agent.at_wp
-                to_wp = situational_graph.get_node_by_exact_pos(wp_pos)
+        for to_wp, free in zip(candidate_nodes, is_collision_free):
+            if free and not situational_graph.G.has_edge(agent.at_wp, to_wp):
+                situational_graph.add_waypoint_diedge(agent.at_wp, to_wp)
 
-                if not situational_graph.G.has_edge(from_wp, to_wp):
-                    situational_graph.add_waypoint_diedge(from_wp, to_wp)
-
-    data = WaypointShortcutViewModel(
-        local_grid=lg,
-        collision_cells=collision_cells,
-        shortcut_candidate_cells=shortcut_candidate_cells,
-    )
-    post_event(Topics.VIEW__SHORTCUT_CHECKING, data)
+    if has_subscribers(Topics.VIEW__SHORTCUT_CHECKING):
+        data = WaypointShortcutViewModel(
+            local_grid=lg,
+            collision_cells=collision_cells,
+            shortcut_candidate_cells=shortcut_candidate_cells,
+        )
+        post_event(Topics.VIEW__SHORTCUT_CHECKING, data)
@@ -1,5 +1,7 @@
 from typing import Optional, Sequence
 
+import numpy as np
+
 from src.config import cfg
 from src.platform_autonomy.control.abstract_agent import AbstractAgent
 from src.platform_autonomy.execution.abstract_behavior import (
@@ -10,7 +12,7 @@ from src.platform_autonomy.execution.behaviors.actions.find_shortcuts_between_wp
     add_shortcut_edges_between_wps_on_lg,
 )
 from src.platform_autonomy.state.frontier_sampling_strategies import (
-    AngularLOSFrontierSamplingStrategy,
+    create_frontier_sampling_strategy,
 )
 from src.platform_autonomy.state.local_grid import LocalGrid
 from src.shared.prior_knowledge.affordance import Affordance
@@ -23,7 +25,8 @@ from src.shared.world_object import WorldObject
 class ExploreBehavior(AbstractBehavior):
     def __init__(self, affordances: list[Affordance]):
         super().__init__(affordances)
-        self._sampling_strategy = AngularLOSFrontierSamplingStrategy()
+        self._sampling_strategy = create_frontier_sampling_strategy()
+        self._recovered = False  # the recovery move already happened in the run
 
     def _run_behavior_implementation(
         self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge
@@ -51,6 +54,47 @@ class ExploreBehavior(AbstractBehavior):
             self._log.warning(f"edge: {behavior_edge}")
             return BehaviorResult(False)
 
+    def can_run_threaded(self, agent: AbstractAgent) -> bool:
+        # the first step adds the frontiers to the graph right away
+        return agent.init_explore_step_completed
+
+    def _run_behavior_implementation_threaded(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge
+    ) -> BehaviorResult:
+        result = self._run_behavior_implementation(agent, situational_graph, behavior_edge)
+        if result.success:
+            lg = agent.read_local_grid()
+            agent.prime_local_grid(lg)
+            self._sampling_strategy.prime_sampling_cache([lg])
+
+        return result
+
+    async def _run_behavior_implementation_async(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge
+    ) -> BehaviorResult:
+        target_node_pos = situational_graph.get_node_data_by_node(behavior_edge[1])["pos"]
+
+        if agent.init_explore_step_completed and agent.get_localization() is not target_node_pos:
+            await agent.move_to_pos_async(target_node_pos)
+            self._log.debug(f"{agent.name}: moving to {target_node_pos}")
+
+            # move back here when we did not get there, so the graph mutation on failure does not block on it
+            if behavior_edge in situational_graph.G.edges and not self.__check_at_destination(
+                agent, situational_graph, behavior_edge[1]
+            ):
+                await agent.move_to_pos_async(
+                    situational_graph.get_node_data_by_node(behavior_edge[0])["pos"], agent.heading
+                )
+                self._recovered = True
+                return BehaviorResult(True)
+
+            await agent.get_local_grid_async()  # read here, so the graph mutation does not block on it
+            return BehaviorResult(True)
+
+        # sampling in place, or already at the node
+        await agent.get_local_grid_async()
+        return self._run_behavior_implementation(agent, situational_graph, behavior_edge)
+
     def _check_postconditions(
         self,
         agent: AbstractAgent,
@@ -128,9 +172,10 @@ class ExploreBehavior(AbstractBehavior):
         situational_graph.remove_node_and_tasks(behavior_edge[1])
         # maintain the previous heading to stop tedious turning
         # TODO: this move to pos is the recovery of the behavior, it should be in the run method.
-        agent.move_to_pos(
-            situational_graph.get_node_data_by_node(behavior_edge[0])["pos"], agent.heading
-        )
+        if not self._recovered:
+            agent.move_to_pos(
+                situational_graph.get_node_data_by_node(behavior_edge[0])["pos"], agent.heading
+            )
         agent.previous_pos = agent.get_localization()
 
         # this is the actual mutation of the grpah on failure
@@ -191,23 +236,124 @@ class ExploreBehavior(AbstractBehavior):
     def __add_new_frontiers_to_situational_graph(
         self, new_frontier_cells, lg: LocalGrid, situational_graph: SituationalGraph, agent
     ):
-        for frontier_cell in new_frontier_cells:
-            frontier_pos_global = lg.rc2xy(frontier_cell)
+        new_frontier_cells = self.__reject_redundant_frontier_cells(
+            new_frontier_cells, lg, situational_graph
+        )
+
+        if cfg.FRONTIER_CLUSTERING:
+            new_frontier_cells = self.__cluster_frontier_cells(new_frontier_cells)
+
+        if not new_frontier_cells:
+            return
+
+        for x, y in lg.rc2xy_many(np.array(new_frontier_cells)):
             situational_graph.add_node_with_task_and_edges_from_affordances(
-                agent.at_wp, Situations.FRONTIER, frontier_pos_global, self.AFFORDANCES
+                agent.at_wp, Situations.FRONTIER, (float(x), float(y)), self.AFFORDANCES
             )
 
-    # 50% of compute time goes to this function for multiple agents
+    @staticmethod
+    def __reject_redundant_frontier_cells(
+        frontier_cells: Sequence[tuple[int, int]],
+        lg: LocalGrid,
+        situational_graph: SituationalGraph,
+    ) -> list[tuple[int, int]]:
+        """
+        Drop the candidates which __prune_frontiers would remove right after insertion,
+        with the same PRUNE_RADIUS test against the waypoints, checked for the whole batch at once.
+        """
+        # only waypoints within the local grid plus the prune radius can be close to a candidate
+        close_wps = situational_graph.get_nodes_of_type_in_margin(
+            lg.lg_xy, cfg.LG_LEN_IN_M / 2 + cfg.PRUNE_RADIUS, Situations.WAYPOINT
+        )
+        if not frontier_cells or not close_wps:
+            return list(frontier_cells)
+
+        frontier_xy = lg.rc2xy_many(np.array(frontier_cells))
+        wp_xy = np.array(
+            [situational_graph.get_node_data_by_node(wp)["pos"] for wp in close_wps]
+        )
+
+        offsets = np.abs(frontier_xy[:, np.newaxis, :] - wp_xy[np.newaxis, :, :])
+        redundant = np.any(np.all(offsets < cfg.PRUNE_RADIUS, axis=2), axis=1)
+
+        return [cell for cell, is_redundant in zip(frontier_cells, redundant) if not is_redundant]
+
+    @staticmethod
+    def __cluster_frontier_cells(
+        frontier_cells: Sequence[tuple[int, int]]
+    ) -> list[tuple[int, int]]:
+        """
+        Merge adjacent frontier cells into one representative per grid bucket of FRONTIER_CLUSTER_SIZE.
+        The representative is the sampled cell closest to the centroid of its bucket,
+        so it is still a cell with line of sight to the agent.
+        """
+        bucket_size = cfg.FRONTIER_CLUSTER_SIZE / cfg.LG_MTR_PER_CELL
+
+        buckets: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        for cell in frontier_cells:
+            bucket = (int(cell[0] // bucket_size), int(cell[1] // bucket_size))
+            buckets.setdefault(bucket, []).append(cell)
+
+        representatives = []
+        for members in buckets.values():
+            centroid = np.mean(members, axis=0)
+            representatives.append(
+                min(
+                    members,
+                    key=lambda cell: (cell[0] - centroid[0]) ** 2
+                    + (cell[1] - centroid[1]) ** 2,
+                )
+            )
+
+        return representatives
+
     def __prune_frontiers(self, situational_graph: SituationalGraph) -> None:
+        """
+        Remove the frontiers within PRUNE_RADIUS of a waypoint.
+        After a prune no frontier is close to a waypoint, so only pairs which involve a node
+        added since the previous prune have to be tested. Those are found with spatial queries.
+        """
+        new_wps = situational_graph.take_new_nodes_of_type(Situations.WAYPOINT)
+        new_fts = situational_graph.take_new_nodes_of_type(Situations.FRONTIER)
 
+        close_frontiers = set()  # avoid duplicates
+        for wp in new_wps:
+            wp_pos = situational_graph.get_node_data_by_node(wp)["pos"]
+            close_frontiers.update(
+                situational_graph.get_nodes_of_type_in_box(
+                    wp_pos, cfg.PRUNE_RADIUS, Situations.FRONTIER
+                )
+            )
+
+        for ft in new_fts:
+            ft_pos = situational_graph.get_node_data_by_node(ft)["pos"]
+            if situational_graph.get_nodes_of_type_in_box(
+                ft_pos, cfg.PRUNE_RADIUS, Situations.WAYPOINT
+            ):
+                close_frontiers.add(ft)
+
+        if cfg.PRUNE_VERIFY:
+            expected_close_frontiers = self.__find_close_frontiers_full_sweep(
+                situational_graph
+            )
+            if close_frontiers != expected_close_frontiers:
+                self._log.error(
+                    f"incremental pruning found {len(close_frontiers)} frontiers, the full sweep {len(expected_close_frontiers)}"
+                )
+                close_frontiers = expected_close_frontiers
+
+        for frontier in close_frontiers:
+            situational_graph.remove_node_and_tasks(frontier)
+
+    # 50% of compute time goes to this function for multiple agents
+    @staticmethod
+    def __find_close_frontiers_full_sweep(situational_graph: SituationalGraph) -> set[Node]:
+        """Test every waypoint against every frontier, used to verify the incremental pruning."""
         ft_and_pos = [
             (ft, situational_graph.G.nodes[ft]["pos"])
             for ft in situational_graph.get_nodes_by_type(Situations.FRONTIER)
         ]
 
-        # FIXME: this function is most expensive
-        # One solution would be using neightbors property in the graph
-        # so instead of doing it for the entire graph, only do it locally next to where the graph was modified
         close_frontiers = set()  # avoid duplicates
 
         # for wp in situational_graph.waypoint_idxs:
@@ -220,5 +366,4 @@ class ExploreBehavior(AbstractBehavior):
                 ):
                     close_frontiers.add(ft)
 
-        for frontier in close_frontiers:
-            situational_graph.remove_node_and_tasks(frontier)
+        return close_frontiers
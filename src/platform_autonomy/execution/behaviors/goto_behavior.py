@@ -24,6 +24,24 @@ class GotoBehavior(AbstractBehavior):
         # return BehaviorResult(success)
         return BehaviorResult(True)
 
+    def _run_behavior_implementation_threaded(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge: Edge
+    ) -> BehaviorResult:
+        result = self._run_behavior_implementation(agent, situational_graph, behavior_edge)
+        agent.prime_local_grid(agent.read_local_grid())
+
+        return result
+
+    async def _run_behavior_implementation_async(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, behavior_edge: Edge
+    ) -> BehaviorResult:
+        node_data = situational_graph.get_node_data_by_node(behavior_edge[1])
+        await agent.move_to_pos_async(node_data["pos"])
+        await agent.get_local_grid_async()  # read here, so the graph mutation does not block on it
+        agent.at_wp = situational_graph.get_closest_waypoint_to_pos(agent.get_localization())
+
+        return BehaviorResult(True)
+
     def _check_postconditions(
         self,
         agent: AbstractAgent,
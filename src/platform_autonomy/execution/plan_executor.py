@@ -1,4 +1,5 @@
 import logging
+from concurrent.futures import Executor
 from typing import Mapping, Sequence, Type
 
 from src.platform_autonomy.control.abstract_agent import AbstractAgent
@@ -41,6 +42,62 @@ class PlanExecutor:
 
         return result
 
+    def execute_plans_threaded(
+        self, agents: Sequence[AbstractAgent], situational_graph: SituationalGraph, pool: Executor
+    ) -> list[BehaviorResult]:
+        """
+        Execute the upcoming edges of the plans of all agents. The moves, sensor reads and ray casting
+        run on the pool while the graph is only read, then the graph is mutated for one agent after the other.
+        """
+        runs = []
+        for agent in agents:
+            behavior_of_current_edge = situational_graph.get_behavior_of_edge(agent.plan.upcoming_edge)
+            if not behavior_of_current_edge:
+                self._log.error(
+                    f"Behavior of edge {agent.plan.upcoming_edge} is not defined in the domain."
+                )
+                runs.append((None, None))
+                continue
+
+            behavior = self.DOMAIN_BEHAVIORS[behavior_of_current_edge](self.AFFORDANCES)
+            future = None
+            if behavior.can_run_threaded(agent):
+                future = pool.submit(
+                    behavior.run_threaded, agent, situational_graph, agent.plan.upcoming_edge
+                )
+            runs.append((behavior, future))
+
+        # every run has to finish before the first mutation, as they read the graph
+        run_results = [future.result() if future else None for _, future in runs]
+
+        results = []
+        for agent, (behavior, _), run_result in zip(agents, runs, run_results):
+            if behavior is None:
+                results.append(BehaviorResult(success=False))
+            elif run_result is None:
+                results.append(behavior.pipeline(agent, situational_graph, agent.plan.upcoming_edge))
+            else:
+                results.append(
+                    behavior.conclude(agent, situational_graph, run_result, agent.plan.upcoming_edge)
+                )
+
+        return results
+
+    async def execute_plan_async(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, plan: Plan
+    ) -> BehaviorResult:
+        behavior_of_current_edge = situational_graph.get_behavior_of_edge(plan.upcoming_edge)
+
+        if not behavior_of_current_edge:
+            self._log.error(
+                f"Behavior of edge {plan.upcoming_edge} is not defined in the domain."
+            )
+            return BehaviorResult(success=False)
+
+        return await self.DOMAIN_BEHAVIORS[behavior_of_current_edge](
+            self.AFFORDANCES
+        ).pipeline_async(agent, situational_graph, plan.upcoming_edge)
+
     @staticmethod
     def process_execution_result(result, agent: AbstractAgent, situational_graph: SituationalGraph):
         if result.success:
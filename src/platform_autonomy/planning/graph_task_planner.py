@@ -1,8 +1,6 @@
 import logging
 from typing import Optional
 
-import networkx as nx
-
 from src.shared.plan import Plan
 from src.shared.situational_graph import SituationalGraph
 from src.shared.task import Task
@@ -69,19 +67,10 @@ class GraphTaskPlanner:
         self, sg: SituationalGraph, source: Node, target: Node
     ) -> Optional[list[Edge]]:
         """returns the shortest path between two nodes"""
+        # the distance field is shared with the task allocator, so this is usually a cache hit
+        path_of_nodes = sg.get_distance_field(source).path_to(target)
 
-        def dist_heur_wrapper(a: Node, b: Node):
-            return sg.calc_edge_len_between_nodes(a, b)
-
-        try:
-            path_of_nodes = nx.astar_path(
-                sg.G,
-                source=source,
-                target=target,
-                weight="cost",
-                heuristic=dist_heur_wrapper,
-            )
-        except nx.NetworkXNoPath:
+        if path_of_nodes is None:
             self._log.debug(f"shortest_path: No path found from {source} to {target}.")
             return None
 
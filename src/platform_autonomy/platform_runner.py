@@ -1,5 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Mapping, Type
+from typing import Mapping, Optional, Type
 
 from src.core.event_system import subscribe
 from src.core.topics import Topics
@@ -20,6 +21,14 @@ class PlatformRunnerMessage:
     # this is still coupled more than I would like because we send object references.
     agent: AbstractAgent
     situational_graph: SituationalGraph
+    replan: bool = True  # otherwise a plan which is still valid is kept
+
+
+@dataclass
+class PlatformRunnerBatchMessage:
+    agents: list[AbstractAgent]
+    situational_graph: SituationalGraph
+    replan: bool = True
 
 
 class PlatformRunner:
@@ -27,16 +36,72 @@ class PlatformRunner:
         self, affordances: list, behaviors: Mapping[Behaviors, Type[AbstractBehavior]]
     ):
         subscribe(Topics.RUN_PLATFORM, self.platform_runner)
+        subscribe(Topics.RUN_PLATFORM_ASYNC, self.platform_runner_async)
+        subscribe(Topics.RUN_PLATFORM_THREADED, self.platform_runner_threaded)
 
         # TODO: this prior knowledge needs to be injected from the usecase
 
         self.plan_executor = PlanExecutor(behaviors, affordances)
         self.planner = GraphTaskPlanner()
+        self._pool: Optional[ThreadPoolExecutor] = None
 
     def platform_runner(self, data: PlatformRunnerMessage):
         agent = data.agent
         situational_graph = data.situational_graph
 
+        self._plan(agent, situational_graph, data.replan)
+
+        """execution"""
+        if agent.plan:
+            # if agent.plan and (agent.task in situational_graph.tasks):
+            result = self.plan_executor.execute_plan(agent, situational_graph, agent.plan)
+
+            self.plan_executor.process_execution_result(result, agent, situational_graph)
+
+        # TODO: make this publish execution results to the mission system.
+
+    async def platform_runner_async(self, data: PlatformRunnerMessage):
+        """platform_runner for the async mission mode, awaits the moves and sensor reads of the behaviors"""
+        agent = data.agent
+        situational_graph = data.situational_graph
+
+        self._plan(agent, situational_graph, data.replan)
+
+        if agent.plan:
+            result = await self.plan_executor.execute_plan_async(
+                agent, situational_graph, agent.plan
+            )
+
+            self.plan_executor.process_execution_result(result, agent, situational_graph)
+
+    def platform_runner_threaded(self, data: PlatformRunnerBatchMessage):
+        """
+        One behavior for each of the agents, executed side by side on a thread pool.
+        The agents plan on the graph as it was at the start, and their graph mutations
+        are applied in the order of the agents, so runs stay deterministic.
+        """
+        situational_graph = data.situational_graph
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=len(data.agents), thread_name_prefix="platform"
+            )
+
+        for agent in data.agents:
+            self._plan(agent, situational_graph, data.replan)
+
+        executing_agents = [agent for agent in data.agents if agent.plan]
+        results = self.plan_executor.execute_plans_threaded(
+            executing_agents, situational_graph, self._pool
+        )
+        for agent, result in zip(executing_agents, results):
+            self.plan_executor.process_execution_result(result, agent, situational_graph)
+
+    def _plan(
+        self, agent: AbstractAgent, situational_graph: SituationalGraph, replan: bool = True
+    ) -> None:
+        if not replan and self._plan_still_valid(agent, situational_graph):
+            return
+
         if agent.init_explore_step_completed:
             filtered_situational_graph = situational_graph.get_filtered_graph(agent.capabilities)
 
@@ -54,11 +119,15 @@ class PlatformRunner:
                 )
                 agent.clear_task()
 
-        """execution"""
-        if agent.plan:
-            # if agent.plan and (agent.task in situational_graph.tasks):
-            result = self.plan_executor.execute_plan(agent, situational_graph, agent.plan)
-
-            self.plan_executor.process_execution_result(result, agent, situational_graph)
+    def _plan_still_valid(self, agent: AbstractAgent, situational_graph: SituationalGraph) -> bool:
+        """the plan starts where the agent is, leads to its task, and the graph still has its edges"""
+        if not agent.task or not self.planner.validate_plan(agent.plan, situational_graph):
+            return False
 
-        # TODO: make this publish execution results to the mission system.
+        return (
+            agent.plan.upcoming_edge[0] == agent.at_wp
+            and agent.plan[-1][1] == agent.task.edge[1]
+            and all(
+                edge in situational_graph.G.edges for edge in agent.plan.edge_sequence
+            )
+        )
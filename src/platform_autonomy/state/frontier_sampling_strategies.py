@@ -1,70 +1,446 @@
+import hashlib
 import math
+import threading
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
 
 import numpy as np
 from numpy import typing as npt
+from scipy import ndimage
 
-from src.config import cfg
-from src.core.event_system import post_event
+from src.config import FrontierStrategy, cfg
+from src.core.event_system import has_subscribers, post_event, subscribe
 from src.core.topics import Topics
 from src.platform_autonomy.state.local_grid import LocalGrid
 
 
+def estimate_openness(local_grid: LocalGrid) -> float:
+    """
+    Fraction of the sample disk the agent can reach through free space, estimated on a coarse grid
+    of OPENNESS_DOWNSAMPLING cells per side where a coarse cell is occupied if any of its cells is.
+    Low in corridors and small rooms, high in open halls.
+    """
+    k = cfg.OPENNESS_DOWNSAMPLING
+    r_central = c_central = math.floor(local_grid.LG_LEN_IN_N_CELLS // 2)
+    n_coarse = math.ceil(cfg.FRONTIER_SAMPLE_RADIUS_NUM_CELLS / k)
+
+    # a window of whole coarse cells around the agent, the agent sits in a corner of the centre cells
+    r0, c0 = max(r_central - n_coarse * k, 0), max(c_central - n_coarse * k, 0)
+    window = local_grid.occupied[r0 : r0 + 2 * n_coarse * k, c0 : c0 + 2 * n_coarse * k]
+    n_rows, n_cols = (window.shape[0] // k) * k, (window.shape[1] // k) * k
+    coarse_occupied = (
+        window[:n_rows, :n_cols].reshape(n_rows // k, k, n_cols // k, k).any(axis=(1, 3))
+    )
+
+    rr, cc = np.ogrid[0 : coarse_occupied.shape[0], 0 : coarse_occupied.shape[1]]
+    coarse_centre = ((r_central - r0) // k, (c_central - c0) // k)
+    in_disk = (rr - coarse_centre[0]) ** 2 + (cc - coarse_centre[1]) ** 2 <= n_coarse**2
+
+    free_components, _ = ndimage.label(in_disk & ~coarse_occupied)
+    agent_component = free_components[coarse_centre]
+    if agent_component == 0:
+        return 0.0
+
+    return float(np.count_nonzero(free_components == agent_component) / np.count_nonzero(in_disk))
+
+
+def n_samples_for(local_grid: LocalGrid) -> int:
+    """
+    N_SAMPLES, or with ADAPTIVE_N_SAMPLES a ray count between ADAPTIVE_N_SAMPLES_MIN and _MAX growing with the openness,
+    rounded to ADAPTIVE_N_SAMPLES_STEP so only a few sets of rays are ever rasterized.
+    """
+    if not cfg.ADAPTIVE_N_SAMPLES:
+        return cfg.N_SAMPLES
+
+    openness = estimate_openness(local_grid)
+    n_samples = cfg.ADAPTIVE_N_SAMPLES_MIN + openness * (
+        cfg.ADAPTIVE_N_SAMPLES_MAX - cfg.ADAPTIVE_N_SAMPLES_MIN
+    )
+    return int(round(n_samples / cfg.ADAPTIVE_N_SAMPLES_STEP) * cfg.ADAPTIVE_N_SAMPLES_STEP)
+
+
+@lru_cache(maxsize=16)
+def _angular_ray_templates(
+    n_samples: int, sample_radius: int, lg_len_in_n_cells: int
+) -> tuple[npt.NDArray, npt.NDArray, npt.NDArray, npt.NDArray]:
+    """
+    The rays from the centre of the local grid to the angular samples only depend on the config,
+    so we rasterize them once. Returns the sample cells and the padded (N, L) ray cells with their lengths.
+    """
+    c_central = math.floor(lg_len_in_n_cells // 2)
+    r_central = math.floor(lg_len_in_n_cells // 2)
+    angles = np.linspace(0, 2 * np.pi, n_samples)
+
+    # so the sample does not match the r,c on the image... but it does not matter
+    r_samples = (c_central + sample_radius * np.sin(angles)).astype(int)
+    c_samples = (r_central + sample_radius * np.cos(angles)).astype(int)
+    sample_cells = np.stack([r_samples, c_samples], axis=1)
+    central_cells = np.tile((r_central, c_central), (n_samples, 1))
+
+    rr, cc, lengths = LocalGrid.cells_on_straight_lines(central_cells, sample_cells)
+
+    templates = sample_cells, rr, cc, lengths
+    for template in templates:
+        template.flags.writeable = False  # shared between all calls
+
+    return templates
+
+
+SamplingResult = tuple[list[tuple[int, int]], list[tuple[int, int]]]
+
+
+class FrontierSamplingCache:
+    """
+    Agents pass the same junctions and corridors again and again, and get nearly the same local grids there.
+    The sampling result only depends on the occupancy around the centre of the grid,
+    so it is stored under the pose quantized to cells and a digest of that occupancy window,
+    for the last FRONTIER_SAMPLING_CACHE_SIZE samplings. Cleared when the sim map changes.
+    Batched sensing and threaded execution prime it with the samplings of the grids the agents
+    are expected to sense, those are kept apart from the cache and used once, also when its size is 0.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[tuple, SamplingResult] = OrderedDict()
+        self._primed: OrderedDict[tuple, SamplingResult] = OrderedDict()
+        self._lock = threading.Lock()  # the threaded platform runner primes it from worker threads
+        self.hits = 0
+        self.misses = 0
+        subscribe(Topics.SIM__MAP_CHANGED, lambda _: self.clear())
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._primed)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._entries or key in self._primed
+
+    @property
+    def enabled(self) -> bool:
+        """whether a sampling has to look for its key, the cache is on or there are primed results"""
+        return cfg.FRONTIER_SAMPLING_CACHE_SIZE > 0 or bool(self._primed)
+
+    @staticmethod
+    def key(strategy: "FrontierSamplingStrategy", local_grid: LocalGrid) -> tuple:
+        """the strategy, the pose in whole cells and a digest of the occupancy any strategy looks at"""
+        quantized_pose = tuple(
+            int(v) for v in np.round(np.asarray(local_grid.lg_xy) / cfg.LG_MTR_PER_CELL)
+        )
+
+        # the sample disk, plus the margins of the boundary strategy and of the openness estimate
+        centre = math.floor(local_grid.LG_LEN_IN_N_CELLS // 2)
+        half_len = cfg.FRONTIER_SAMPLE_RADIUS_NUM_CELLS + max(cfg.OPENNESS_DOWNSAMPLING, 2)
+        r0 = c0 = max(centre - half_len, 0)
+        window = local_grid.occupied[r0 : centre + half_len + 1, c0 : centre + half_len + 1]
+        digest = hashlib.blake2b(np.packbits(window).tobytes(), digest_size=16)
+        digest.update(np.array(window.shape).tobytes())
+
+        return type(strategy), quantized_pose, digest.digest()
+
+    def get(self, key: tuple) -> Optional[SamplingResult]:
+        with self._lock:
+            result = self._primed.pop(key, None)
+            if result is not None:
+                self._put(key, result)
+            else:
+                result = self._entries.get(key)
+                if result is None:
+                    self.misses += 1
+                    return None
+                self._entries.move_to_end(key)
+
+            self.hits += 1
+        candidate_frontiers, collision_cells = result
+        return list(candidate_frontiers), list(collision_cells)
+
+    def put(self, key: tuple, result: SamplingResult) -> None:
+        candidate_frontiers, collision_cells = result
+        with self._lock:
+            self._put(key, (list(candidate_frontiers), list(collision_cells)))
+
+    def prime(self, key: tuple, result: SamplingResult) -> None:
+        """a sampling for the next get of key, agents which end up elsewhere leave theirs for the oldest to go"""
+        candidate_frontiers, collision_cells = result
+        with self._lock:
+            self._primed[key] = (list(candidate_frontiers), list(collision_cells))
+            while len(self._primed) > 2 * cfg.NUM_AGENTS:
+                self._primed.popitem(last=False)
+
+    def _put(self, key: tuple, result: SamplingResult) -> None:
+        if cfg.FRONTIER_SAMPLING_CACHE_SIZE <= 0:
+            return
+
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > cfg.FRONTIER_SAMPLING_CACHE_SIZE:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._primed.clear()
+
+
+# shared by all agents, behaviors are created anew for every edge they execute
+_sampling_cache = FrontierSamplingCache()
+
+
 class FrontierSamplingStrategy(ABC):
     """Base class for frontier sampling strategies."""
 
-    @abstractmethod
     def sample_frontiers(self, local_grid: LocalGrid) -> list[tuple[int, int]]:
-        """Sample frontiers from the local grid."""
+        """Sample frontiers from the local grid, and show them with the collisions found on the way."""
+        candidate_frontiers, collision_cells = self._cached_sample_frontier_cells(local_grid)
+
+        if has_subscribers(Topics.VIEW__FRONTIER_SAMPLING):
+            post_event(
+                Topics.VIEW__FRONTIER_SAMPLING,
+                FrontierSamplingViewModel(
+                    local_grid_img=local_grid.img_data,
+                    new_frontier_cells=candidate_frontiers,
+                    collision_cells=collision_cells,
+                ),
+            )
+
+        return candidate_frontiers
+
+    def prime_sampling_cache(self, local_grids: list[LocalGrid]) -> None:
+        """sample a batch of grids ahead of time, sample_frontiers takes the results from the cache"""
+        keys = [_sampling_cache.key(self, local_grid) for local_grid in local_grids]
+        missing = [idx for idx, key in enumerate(keys) if key not in _sampling_cache]
+        results = self._sample_frontier_cells_batch([local_grids[idx] for idx in missing])
+        for idx, result in zip(missing, results):
+            _sampling_cache.prime(keys[idx], result)
+
+    def _cached_sample_frontier_cells(self, local_grid: LocalGrid) -> SamplingResult:
+        if not _sampling_cache.enabled:
+            return self._sample_frontier_cells(local_grid)
+
+        key = _sampling_cache.key(self, local_grid)
+        result = _sampling_cache.get(key)
+        if result is None:
+            result = self._sample_frontier_cells(local_grid)
+            _sampling_cache.put(key, result)
+
+        return result
+
+    @abstractmethod
+    def _sample_frontier_cells(self, local_grid: LocalGrid) -> SamplingResult:
+        """Returns the frontier cells and the collision cells to show."""
+        pass
+
+    def _sample_frontier_cells_batch(self, local_grids: list[LocalGrid]) -> list[SamplingResult]:
+        """_sample_frontier_cells for many grids, strategies can vectorize this over the grids"""
+        return [self._sample_frontier_cells(local_grid) for local_grid in local_grids]
+
+
+class RayFrontierSamplingStrategy(FrontierSamplingStrategy):
+    """
+    Base class for the strategies which cast the angular rays from the agent to the sample radius,
+    subclasses turn the first collisions on the rays into frontiers.
+    """
+
+    def _sample_frontier_cells(self, local_grid: LocalGrid) -> SamplingResult:
+        ray_templates = _angular_ray_templates(
+            n_samples_for(local_grid),
+            cfg.FRONTIER_SAMPLE_RADIUS_NUM_CELLS,
+            local_grid.LG_LEN_IN_N_CELLS,
+        )
+        _, rr, cc, lengths = ray_templates
+        first_collisions = local_grid.first_collisions_along_lines(rr, cc, lengths)
+
+        return self._frontiers_from_rays(ray_templates, first_collisions)
+
+    def _sample_frontier_cells_batch(self, local_grids: list[LocalGrid]) -> list[SamplingResult]:
+        """the grids with the same number of rays are checked in one gather over the stacked occupancy"""
+        results: list[Optional[SamplingResult]] = [None] * len(local_grids)
+
+        grids_per_n_samples: dict[int, list[int]] = {}
+        for idx, local_grid in enumerate(local_grids):
+            grids_per_n_samples.setdefault(n_samples_for(local_grid), []).append(idx)
+
+        for n_samples, idxs in grids_per_n_samples.items():
+            ray_templates = _angular_ray_templates(
+                n_samples, cfg.FRONTIER_SAMPLE_RADIUS_NUM_CELLS, local_grids[idxs[0]].LG_LEN_IN_N_CELLS
+            )
+            _, rr, cc, lengths = ray_templates
+            first_collisions = LocalGrid.first_collisions_in_grids(
+                np.stack([local_grids[idx].occupied for idx in idxs]), rr, cc, lengths
+            )
+            for idx, grid_first_collisions in zip(idxs, first_collisions):
+                results[idx] = self._frontiers_from_rays(ray_templates, grid_first_collisions)
+
+        return results
+
+    @abstractmethod
+    def _frontiers_from_rays(
+        self, ray_templates: tuple[npt.NDArray, ...], first_collisions: npt.NDArray
+    ) -> SamplingResult:
+        """the frontier cells and collision cells, given the ray templates and the first collision on each ray"""
         pass
 
 
-class AngularLOSFrontierSamplingStrategy(FrontierSamplingStrategy):
-    def sample_frontiers(
-        self,
-        local_grid: LocalGrid,
-    ) -> list[tuple[int, int]]:
+class AngularLOSFrontierSamplingStrategy(RayFrontierSamplingStrategy):
+    def _frontiers_from_rays(
+        self, ray_templates: tuple[npt.NDArray, ...], first_collisions: npt.NDArray
+    ) -> SamplingResult:
         """
-        Given a local grid, sample N_SAMPLES points in a circle around the agent, and return the sampled frontiers.
+        Sample N_SAMPLES points in a circle around the agent, the points in line of sight are the frontiers.
+        With ADAPTIVE_N_SAMPLES the number of points follows the openness around the agent.
         We start in cell coords
         """
-        collision_cells = []
-        candidate_frontiers = []
-        for angle in np.linspace(0, 2 * np.pi, cfg.N_SAMPLES):
-
-            SAMPLE_RADIUS = cfg.FRONTIER_SAMPLE_RADIUS_NUM_CELLS
-            c_central = math.floor(local_grid.LG_LEN_IN_N_CELLS // 2)
-            r_central = math.floor(local_grid.LG_LEN_IN_N_CELLS // 2)
-
-            # so the sample does not match the r,c on the image... but it does not matter
-            r_sample = int(c_central + SAMPLE_RADIUS * np.sin(angle))
-            c_sample = int(r_central + SAMPLE_RADIUS * np.cos(angle))
-
-            (
-                sample_valid,
-                collision_point,
-            ) = local_grid.is_collision_free_straight_line_between_cells(
-                r0c0=(r_central, c_central),
-                r1c1=(r_sample, c_sample),
+        sample_cells, rr, cc, _ = ray_templates
+
+        sample_valid = first_collisions < 0
+        colliding = np.flatnonzero(~sample_valid)
+
+        candidate_frontiers = [
+            (int(r), int(c)) for r, c in sample_cells[sample_valid]
+        ]
+        collision_cells = [
+            (int(r), int(c))
+            for r, c in zip(
+                rr[colliding, first_collisions[colliding]],
+                cc[colliding, first_collisions[colliding]],
             )
+        ]
+
+        return candidate_frontiers, collision_cells
 
-            if sample_valid:
-                candidate_frontiers.append((r_sample, c_sample))
-            elif collision_point:
-                collision_cell = local_grid.xy2rc(collision_point)
-                collision_cells.append(collision_cell)
-
-        post_event(
-            Topics.VIEW__FRONTIER_SAMPLING,
-            FrontierSamplingViewModel(
-                local_grid_img=local_grid.img_data,
-                new_frontier_cells=candidate_frontiers,
-                collision_cells=collision_cells,
-            ),
+
+class RingFrontierSamplingStrategy(RayFrontierSamplingStrategy):
+    """
+    Evaluates RING_N_RADII radii per angle inside the ring of SAMPLE_RING_WIDTH below the sample radius,
+    and keeps the farthest free one on each ray, so partly blocked directions still give a frontier.
+    """
+
+    def _frontiers_from_rays(
+        self, ray_templates: tuple[npt.NDArray, ...], first_collisions: npt.NDArray
+    ) -> SamplingResult:
+        _, rr, cc, lengths = ray_templates
+
+        # the steps along each ray at the radii in the ring, the outer radius is the ray end
+        inner_fraction = 1 - cfg.SAMPLE_RING_WIDTH
+        radius_fractions = np.linspace(1, inner_fraction, cfg.RING_N_RADII, endpoint=False)
+        sample_steps = np.rint(
+            radius_fractions[np.newaxis, :] * (lengths[:, np.newaxis] - 1)
+        ).astype(int)  # (N, RING_N_RADII), farthest first
+
+        is_free = (first_collisions[:, np.newaxis] < 0) | (
+            sample_steps < first_collisions[:, np.newaxis]
         )
+        is_free &= sample_steps > 0
+        has_free_sample = is_free.any(axis=1)
+        farthest_free_steps = sample_steps[np.arange(len(sample_steps)), np.argmax(is_free, axis=1)]
 
-        return candidate_frontiers
+        ray_idxs = np.flatnonzero(has_free_sample)
+        candidate_frontiers = [
+            (int(r), int(c))
+            for r, c in zip(
+                rr[ray_idxs, farthest_free_steps[ray_idxs]],
+                cc[ray_idxs, farthest_free_steps[ray_idxs]],
+            )
+        ]
+        colliding = np.flatnonzero(first_collisions >= 0)
+        collision_cells = [
+            (int(r), int(c))
+            for r, c in zip(
+                rr[colliding, first_collisions[colliding]],
+                cc[colliding, first_collisions[colliding]],
+            )
+        ]
+
+        return candidate_frontiers, collision_cells
+
+
+class BoundaryFrontierSamplingStrategy(FrontierSamplingStrategy):
+    """
+    Finds the boundary between the known free space around the agent and the unknown space,
+    and places one frontier per connected segment of that boundary.
+    The local grid has no unknown cells of its own, so everything outside the sample radius counts as unknown.
+    """
+
+    def _sample_frontier_cells(self, local_grid: LocalGrid) -> SamplingResult:
+        r_central = c_central = math.floor(local_grid.LG_LEN_IN_N_CELLS // 2)
+
+        # only look at the window around the sample disk, with a margin of unknown cells
+        radius = cfg.FRONTIER_SAMPLE_RADIUS_NUM_CELLS
+        r0, c0 = max(r_central - radius - 1, 0), max(c_central - radius - 1, 0)
+        occupied = local_grid.occupied[
+            r0 : r_central + radius + 2, c0 : c_central + radius + 2
+        ]
+        n_rows, n_cols = occupied.shape
+
+        rr, cc = np.ogrid[r0 : r0 + n_rows, c0 : c0 + n_cols]
+        in_sample_disk = (rr - r_central) ** 2 + (cc - c_central) ** 2 <= radius**2
+
+        # the known free space is the free space in the disk the agent can reach
+        free_components, _ = ndimage.label(in_sample_disk & ~occupied)
+        agent_component = free_components[r_central - r0, c_central - c0]
+        if agent_component == 0:
+            return [], []
+        known_free = free_components == agent_component
+
+        # known free cells next to the unknown space, the dilation difference of the unknown space
+        unknown = ~in_sample_disk
+        boundary = known_free & ndimage.binary_dilation(unknown, structure=np.ones((3, 3)))
+
+        components, n_components = ndimage.label(boundary, structure=np.ones((3, 3)))
+        if n_components == 0:
+            return [], []
+
+        # long boundary components are split in angular sectors around the agent,
+        # so a segment spans at most about BOUNDARY_SEGMENT_LEN of boundary
+        boundary_cells = np.argwhere(boundary) + (r0, c0)
+        sample_circumference = 2 * np.pi * radius * cfg.LG_MTR_PER_CELL
+        n_sectors = max(1, math.ceil(sample_circumference / cfg.BOUNDARY_SEGMENT_LEN))
+        angles = np.arctan2(boundary_cells[:, 0] - r_central, boundary_cells[:, 1] - c_central)
+        sectors = ((angles + np.pi) / (2 * np.pi) * n_sectors).astype(int) % n_sectors
+        segment_keys = (
+            components[boundary_cells[:, 0] - r0, boundary_cells[:, 1] - c0] * n_sectors + sectors
+        )
+        _, segment_of_cell = np.unique(segment_keys, return_inverse=True)
+        segment_of_cell = segment_of_cell.ravel()
+
+        n_cells_per_segment = np.bincount(segment_of_cell)
+        centroids = np.stack(
+            [
+                np.bincount(segment_of_cell, weights=boundary_cells[:, 0]),
+                np.bincount(segment_of_cell, weights=boundary_cells[:, 1]),
+            ],
+            axis=1,
+        ) / n_cells_per_segment[:, np.newaxis]
+
+        # the frontier of a segment is the cell in view of the agent closest to its centroid
+        in_view, first_collision_cells = local_grid.are_collision_free_straight_lines_between_cells(
+            np.tile((r_central, c_central), (len(boundary_cells), 1)), boundary_cells
+        )
+
+        candidate_frontiers = []
+        for segment_idx, centroid in enumerate(centroids):
+            members = boundary_cells[(segment_of_cell == segment_idx) & in_view]
+            if len(members) < cfg.BOUNDARY_MIN_SEGMENT_CELLS:
+                continue
+
+            closest = members[np.argmin(np.sum((members - centroid) ** 2, axis=1))]
+            candidate_frontiers.append((int(closest[0]), int(closest[1])))
+
+        collision_cells = [(int(r), int(c)) for r, c in first_collision_cells[~in_view]]
+
+        return candidate_frontiers, collision_cells
+
+
+FRONTIER_SAMPLING_STRATEGIES: dict[FrontierStrategy, type[FrontierSamplingStrategy]] = {
+    FrontierStrategy.ANGULAR_LOS: AngularLOSFrontierSamplingStrategy,
+    FrontierStrategy.RING: RingFrontierSamplingStrategy,
+    FrontierStrategy.BOUNDARY: BoundaryFrontierSamplingStrategy,
+}
+
+
+def create_frontier_sampling_strategy() -> FrontierSamplingStrategy:
+    """the sampling strategy selected in the config"""
+    return FRONTIER_SAMPLING_STRATEGIES[cfg.FRONTIER_STRATEGY]()
 
 
 @dataclass
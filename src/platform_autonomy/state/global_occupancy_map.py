@@ -0,0 +1,269 @@
+import itertools
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+from scipy import ndimage
+
+from src.config import cfg
+from src.platform_autonomy.state.local_grid import LocalGrid
+
+TileKey = tuple[int, int]
+
+
+class GlobalOccupancyMap:
+    """
+    Occupancy of everything the agents have seen, fused from successive local grids.
+    Stored as a sparse dict of fixed size tiles of cells in world aligned (ix, iy) indices,
+    the least recently used tiles are evicted to bound the memory.
+    """
+
+    UNKNOWN = 0
+    FREE = 1
+    OCCUPIED = 2
+
+    def __init__(
+        self,
+        cell_size: Optional[float] = None,
+        tile_size: Optional[int] = None,
+        max_tiles: Optional[int] = None,
+    ) -> None:
+        self._log = logging.getLogger(__name__)
+
+        self.cell_size = cell_size or cfg.LG_MTR_PER_CELL
+        self.tile_size = tile_size or cfg.GLOBAL_MAP_TILE_SIZE
+        self.max_tiles = max_tiles or cfg.GLOBAL_MAP_MAX_TILES
+
+        self._tiles: OrderedDict[TileKey, npt.NDArray[np.uint8]] = OrderedDict()
+        # versions are never reused, so a tile which is evicted and seen again gets a new one
+        self._tile_versions: dict[TileKey, int] = {}
+        self._version_counter = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._tiles) * self.tile_size**2
+
+    def tile_version(self, key: TileKey) -> int:
+        """the version of a tile changes whenever its content changes, 0 for unknown tiles"""
+        return self._tile_versions.get(key, 0)
+
+    def occupancy_token(
+        self, xy0: tuple[float, float], xy1: tuple[float, float], margin: float
+    ) -> tuple:
+        """
+        The versions of the tiles around the segment between xy0 and xy1,
+        changes whenever new sensor data changes the occupancy near the segment.
+        """
+        margin_cells = int(np.ceil(margin / self.cell_size)) + 1
+        ijs = self.xy2ij(np.array([xy0, xy1]))
+        key_min = (ijs.min(axis=0) - margin_cells) // self.tile_size
+        key_max = (ijs.max(axis=0) + margin_cells) // self.tile_size
+
+        return tuple(
+            self.tile_version((ti, tj))
+            for ti in range(key_min[0], key_max[0] + 1)
+            for tj in range(key_min[1], key_max[1] + 1)
+        )
+
+    def xy2ij(self, xys: npt.NDArray) -> npt.NDArray:
+        """(N, 2) world coordinates to the (N, 2) global cell indices containing them"""
+        return np.floor(np.asarray(xys, dtype=float).reshape(-1, 2) / self.cell_size).astype(int)
+
+    def ij2xy(self, ijs: npt.NDArray) -> npt.NDArray:
+        """(N, 2) global cell indices to the world coordinates of their centres"""
+        return (np.asarray(ijs).reshape(-1, 2) + 0.5) * self.cell_size
+
+    def fuse(self, lg: LocalGrid) -> None:
+        """Write the occupancy of a local grid into the map at its lg_xy, the latest reading wins."""
+        # resample the local grid at the centres of the global cells it covers, both grids are
+        # axis aligned so the x index only picks the column and the y index only picks the row
+        corners = self.xy2ij(lg.rc2xy_many(np.array([[0, 0], lg.occupied.shape])))
+        ij_min, ij_max = corners.min(axis=0), corners.max(axis=0)
+        i_range = np.arange(ij_min[0], ij_max[0] + 1)
+        j_range = np.arange(ij_min[1], ij_max[1] + 1)
+
+        xs = self.ij2xy(np.stack([i_range, np.full_like(i_range, ij_min[1])], axis=1))[:, 0]
+        ys = self.ij2xy(np.stack([np.full_like(j_range, ij_min[0]), j_range], axis=1))[:, 1]
+        col_rcs, i_on_lg = lg.xy2rc_many(np.stack([xs, np.full_like(xs, lg.lg_xy[1])], axis=1))
+        row_rcs, j_on_lg = lg.xy2rc_many(np.stack([np.full_like(ys, lg.lg_xy[0]), ys], axis=1))
+        if not i_on_lg.any() or not j_on_lg.any():
+            return
+
+        # (i, j) block of the global cells on the local grid, the valid ranges are contiguous
+        block_min = np.array([i_range[i_on_lg][0], j_range[j_on_lg][0]])
+        block = np.where(
+            lg.occupied[np.ix_(row_rcs[j_on_lg, 0], col_rcs[i_on_lg, 1])].T,
+            self.OCCUPIED,
+            self.FREE,
+        ).astype(np.uint8)
+        block_max = block_min + block.shape - 1
+
+        key_min = block_min // self.tile_size
+        key_max = block_max // self.tile_size
+        for ti in range(key_min[0], key_max[0] + 1):
+            for tj in range(key_min[1], key_max[1] + 1):
+                tile_origin = np.array((ti, tj)) * self.tile_size
+                lo = np.maximum(block_min, tile_origin)
+                hi = np.minimum(block_max + 1, tile_origin + self.tile_size)
+
+                block_part = block[
+                    lo[0] - block_min[0] : hi[0] - block_min[0],
+                    lo[1] - block_min[1] : hi[1] - block_min[1],
+                ]
+                tile = self._get_or_create_tile((ti, tj))
+                tile_part = tile[
+                    lo[0] - tile_origin[0] : hi[0] - tile_origin[0],
+                    lo[1] - tile_origin[1] : hi[1] - tile_origin[1],
+                ]
+                if np.array_equal(tile_part, block_part):
+                    continue
+
+                tile_part[...] = block_part
+                self._tile_versions[(ti, tj)] = next(self._version_counter)
+
+        self._evict_least_recently_used()
+
+    def _get_or_create_tile(self, key: TileKey) -> npt.NDArray[np.uint8]:
+        tile = self._tiles.get(key)
+        if tile is None:
+            tile = np.full((self.tile_size, self.tile_size), self.UNKNOWN, dtype=np.uint8)
+            self._tiles[key] = tile
+            self._tile_versions[key] = next(self._version_counter)
+        else:
+            self._tiles.move_to_end(key)
+
+        return tile
+
+    def _evict_least_recently_used(self) -> None:
+        while len(self._tiles) > self.max_tiles:
+            key, _ = self._tiles.popitem(last=False)
+            del self._tile_versions[key]
+
+    def window(self, ij_min: npt.NDArray, ij_max: npt.NDArray) -> npt.NDArray[np.uint8]:
+        """Dense copy of the cells from ij_min up to and including ij_max, stitched from the tiles."""
+        ij_min, ij_max = np.asarray(ij_min), np.asarray(ij_max)
+        dense = np.full(ij_max - ij_min + 1, self.UNKNOWN, dtype=np.uint8)
+
+        key_min = ij_min // self.tile_size
+        key_max = ij_max // self.tile_size
+        for ti in range(key_min[0], key_max[0] + 1):
+            for tj in range(key_min[1], key_max[1] + 1):
+                tile = self._tiles.get((ti, tj))
+                if tile is None:
+                    continue
+
+                self._tiles.move_to_end((ti, tj))
+                tile_origin = np.array((ti, tj)) * self.tile_size
+                lo = np.maximum(ij_min, tile_origin)
+                hi = np.minimum(ij_max + 1, tile_origin + self.tile_size)
+
+                dense_rows = slice(lo[0] - ij_min[0], hi[0] - ij_min[0])
+                dense_cols = slice(lo[1] - ij_min[1], hi[1] - ij_min[1])
+                tile_rows = slice(lo[0] - tile_origin[0], hi[0] - tile_origin[0])
+                tile_cols = slice(lo[1] - tile_origin[1], hi[1] - tile_origin[1])
+                dense[dense_rows, dense_cols] = tile[tile_rows, tile_cols]
+
+        return dense
+
+    def clearance(self, xys: npt.NDArray, max_range: float) -> npt.NDArray:
+        """
+        Distance in meters from each position to the closest occupied cell,
+        np.inf if there is none within max_range.
+        """
+        ijs = self.xy2ij(xys)
+        if len(ijs) == 0:
+            return np.zeros(0)
+
+        margin = int(np.ceil(max_range / self.cell_size)) + 1
+        clearance = np.empty(len(ijs))
+        for idxs, ij_min, ij_max in self._cluster_boxes(ijs - margin, ijs + margin):
+            clearance[idxs] = self._window_clearance(self.window(ij_min, ij_max))[
+                ijs[idxs, 0] - ij_min[0], ijs[idxs, 1] - ij_min[1]
+            ]
+        clearance[clearance > max_range] = np.inf
+        return clearance
+
+    def _cluster_boxes(
+        self, box_mins: npt.NDArray, box_maxs: npt.NDArray
+    ) -> list[tuple[npt.NDArray, npt.NDArray, npt.NDArray]]:
+        """
+        Group (N, 2) boxes of cells into windows to read at once, as (idxs, ij_min, ij_max).
+        Boxes are visited tile by tile and a box only joins the current window if that grows the
+        window by no more than the area of the box, so a window never has more cells than its boxes.
+        """
+        areas = np.prod(box_maxs - box_mins + 1, axis=1)
+        keys = box_mins // self.tile_size
+        order = np.lexsort((keys[:, 1], keys[:, 0]))
+
+        clusters: list[tuple[list[int], npt.NDArray, npt.NDArray]] = []
+        for idx in order:
+            if clusters:
+                idxs, ij_min, ij_max = clusters[-1]
+                joined_min = np.minimum(ij_min, box_mins[idx])
+                joined_max = np.maximum(ij_max, box_maxs[idx])
+                if np.prod(joined_max - joined_min + 1) <= np.prod(ij_max - ij_min + 1) + areas[idx]:
+                    idxs.append(idx)
+                    clusters[-1] = (idxs, joined_min, joined_max)
+                    continue
+
+            clusters.append(([idx], box_mins[idx], box_maxs[idx]))
+
+        return [(np.array(idxs), ij_min, ij_max) for idxs, ij_min, ij_max in clusters]
+
+    def _window_clearance(self, window: npt.NDArray[np.uint8]) -> npt.NDArray:
+        occupied = window == self.OCCUPIED
+        if not occupied.any():
+            return np.full(window.shape, np.inf)
+
+        return ndimage.distance_transform_edt(~occupied) * self.cell_size
+
+    def are_collision_free_straight_lines(
+        self,
+        xy0s: npt.NDArray,
+        xy1s: npt.NDArray,
+        robot_radius: float = 0.0,
+        unknown_is_free: bool = False,
+    ) -> tuple[npt.NDArray[np.bool_], npt.NDArray]:
+        """
+        Line of sight between N pairs of world positions, across as many tiles as needed.
+        Returns for each line whether it is collision free for a robot of the given radius,
+        and an (N, 2) array with the world position of the first collision, nan for the free lines.
+        """
+        ij0s, ij1s = self.xy2ij(xy0s), self.xy2ij(xy1s)
+        if len(ij0s) == 0:
+            return np.zeros(0, dtype=bool), np.zeros((0, 2))
+
+        margin = int(np.ceil(robot_radius / self.cell_size)) + 1
+        box_mins = np.minimum(ij0s, ij1s) - margin
+        box_maxs = np.maximum(ij0s, ij1s) + margin
+
+        is_free = np.empty(len(ij0s), dtype=bool)
+        collision_xys = np.full((len(ij0s), 2), np.nan)
+        for idxs, ij_min, ij_max in self._cluster_boxes(box_mins, box_maxs):
+            window = self.window(ij_min, ij_max)
+            blocked_cells = window == self.OCCUPIED
+            if robot_radius > 0:
+                blocked_cells = self._window_clearance(window) <= robot_radius
+            if not unknown_is_free:
+                blocked_cells |= window == self.UNKNOWN
+
+            ii, jj, lengths = LocalGrid.cells_on_straight_lines(
+                ij0s[idxs] - ij_min, ij1s[idxs] - ij_min
+            )
+            first_collision = LocalGrid.first_collisions_in_grids(
+                blocked_cells[np.newaxis], ii, jj, lengths
+            )[0]
+            is_free[idxs] = first_collision < 0
+
+            hit = first_collision >= 0
+            collision_ijs = np.stack(
+                [ii[hit, first_collision[hit]], jj[hit, first_collision[hit]]], axis=1
+            )
+            collision_xys[idxs[hit]] = self.ij2xy(collision_ijs + ij_min)
+
+        return is_free, collision_xys
@@ -1,22 +1,76 @@
+import hashlib
 import logging
-from typing import Optional
+from typing import Callable, Optional
 
 import numpy as np
 import numpy.typing as npt
-from skimage import draw
+from scipy import ndimage
 
 from src.config import Scenario, cfg
 
+PIXEL_OCCUPIED_THRESHOLD = 220
+
+OccupancyDecoder = Callable[[npt.NDArray], npt.NDArray[np.bool_]]
+
+
+def decode_spot_occupancy(img_data: npt.NDArray) -> npt.NDArray[np.bool_]:
+    """spot obstacle distance grid, channel 0 is inside and channel 1 the border of obstacles"""
+    return np.any(img_data[..., 0:2] > PIXEL_OCCUPIED_THRESHOLD, axis=-1)
+
+
+def decode_alpha_occupancy(img_data: npt.NDArray) -> npt.NDArray[np.bool_]:
+    """world images with the walls in the alpha channel"""
+    return img_data[..., 3] > PIXEL_OCCUPIED_THRESHOLD
+
+
+def decode_dark_occupancy(img_data: npt.NDArray) -> npt.NDArray[np.bool_]:
+    """world images with white free space, any darker channel is a wall"""
+    return np.any(img_data < PIXEL_OCCUPIED_THRESHOLD, axis=-1)
+
+
+# We need a decoder per scenario because the image datas have different channels in them.
+# Ideally we'd process the simmed dat to match the Spot channels.
+OCCUPANCY_DECODERS: dict[Scenario, OccupancyDecoder] = {
+    Scenario.REAL: decode_spot_occupancy,
+    Scenario.SIM_MAZE_MEDIUM: decode_alpha_occupancy,
+}
+DEFAULT_OCCUPANCY_DECODER: OccupancyDecoder = decode_dark_occupancy
+
 
 class LocalGrid:
-    def __init__(self, xy: tuple[float, float], img_data: npt.NDArray):
+    def __init__(
+        self,
+        xy: tuple[float, float],
+        img_data: npt.NDArray,
+        occupancy_decoder: Optional[OccupancyDecoder] = None,
+    ):
         self._log = logging.getLogger(__name__)
 
         self.lg_xy = xy # Robot pose when the lg image was obtained
         self.img_data = img_data  # r,c with (0,0) top left (numpy convention)
 
         self.LG_LEN_IN_N_CELLS = int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL)
-        self.PIXEL_OCCUPIED_THRESHOLD = 220
+        self.PIXEL_OCCUPIED_THRESHOLD = PIXEL_OCCUPIED_THRESHOLD
+
+        # affine transform between world xy and cells: the offset from the grid centre to the
+        # corner of cell (0, 0) in meters and in cells, and the direction of the rows along y
+        if cfg.SCENARIO == Scenario.REAL:
+            # if xy == lg_xy we obtain the center cell of the local grid
+            self._corner_offset_m = 0.0
+            self._corner_offset_cells = self.LG_LEN_IN_N_CELLS / 2
+            self._row_sign = 1
+        else:
+            # if xy == lg_xy we obtain the center cell of the local grid as well...
+            self._corner_offset_m = cfg.LG_LEN_IN_M / 2
+            self._corner_offset_cells = 0.0
+            self._row_sign = -1
+
+        self._occupancy_decoder = occupancy_decoder or OCCUPANCY_DECODERS.get(
+            cfg.SCENARIO, DEFAULT_OCCUPANCY_DECODER
+        )
+        self._occupied: Optional[npt.NDArray[np.bool_]] = None
+        self._clearance: Optional[npt.NDArray[np.float64]] = None
+        self._occupancy_pyramid: Optional[list[npt.NDArray[np.bool_]]] = None
 
     def is_within_local_grid(self, coords: tuple[float, float]) -> bool:
         """
@@ -36,92 +90,309 @@ class LocalGrid:
         Convert the world coordinates to the cell indices of the local grid.
         Assumes that the world coordinate falls within the local grid.
         """
-
-        if not self.is_within_local_grid(xy):
+        rcs, valid = self.xy2rc_many(np.array([xy], dtype=float))
+        if not valid[0]:
             raise ValueError(f"World coordinate {xy} is not within the local grid.")
 
-        if cfg.SCENARIO == Scenario.REAL:
-            # if xy == lg_xy we obtain the center cell of the local grid
-            c = int(
-                (xy[0] - self.lg_xy[0]) / cfg.LG_MTR_PER_CELL
-                + self.LG_LEN_IN_N_CELLS / 2
-            )
-            r = int(
-                (xy[1] - self.lg_xy[1]) / cfg.LG_MTR_PER_CELL
-                + self.LG_LEN_IN_N_CELLS / 2
-            )
-
-        else:
-            # if xy == lg_xy we obtain the center cell of the local grid as well...
-            c = int((xy[0] - self.lg_xy[0] + cfg.LG_LEN_IN_M / 2) / cfg.LG_MTR_PER_CELL)
-            r = int(
-                (-xy[1] + self.lg_xy[1] + cfg.LG_LEN_IN_M / 2) / cfg.LG_MTR_PER_CELL
-            )
-
-        return r, c
+        return int(rcs[0, 0]), int(rcs[0, 1])
 
     def rc2xy(self, rc: tuple[int, int]) -> tuple[float, float]:
         """
         Convert np img array indices (r, c) to world coordinates (x, y).
         Assumes we know the position of the local grid in the world.
         """
-        if cfg.SCENARIO == Scenario.REAL:
-            x = (
-                self.lg_xy[0]
-                + (rc[1] - self.LG_LEN_IN_N_CELLS / 2) * cfg.LG_MTR_PER_CELL
-            )
-            y = (
-                self.lg_xy[1]
-                + (rc[0] - self.LG_LEN_IN_N_CELLS / 2) * cfg.LG_MTR_PER_CELL
-            )
-        else:
-            x = self.lg_xy[0] - cfg.LG_LEN_IN_M / 2 + rc[1] * cfg.LG_MTR_PER_CELL
-            y = self.lg_xy[1] + cfg.LG_LEN_IN_M / 2 - rc[0] * cfg.LG_MTR_PER_CELL
+        x, y = self.rc2xy_many(np.array([rc]))[0]
+        return float(x), float(y)
 
-        return x, y
+    def xy2rc_many(
+        self, xys: npt.NDArray
+    ) -> tuple[npt.NDArray, npt.NDArray[np.bool_]]:
+        """
+        Convert (N, 2) world coordinates to (N, 2) cell indices of the local grid at once.
+        Also returns a mask of the coordinates which fall on a cell of the grid,
+        the indices of the other coordinates are set to 0.
+        """
+        xys = np.asarray(xys, dtype=float).reshape(-1, 2)
+        cols = (
+            xys[:, 0] - self.lg_xy[0] + self._corner_offset_m
+        ) / cfg.LG_MTR_PER_CELL + self._corner_offset_cells
+        rows = (
+            self._row_sign * (xys[:, 1] - self.lg_xy[1]) + self._corner_offset_m
+        ) / cfg.LG_MTR_PER_CELL + self._corner_offset_cells
+        rcs_float = np.stack([rows, cols], axis=1)
 
-    def is_collision_free_straight_line_between_cells(
-        self, r0c0: tuple[int, int], r1c1: tuple[int, int]
-    ) -> tuple[bool, Optional[tuple[float, float]]]:
-        # TODO: Pain in the ass to refactor. Ask for help.
+        valid = np.all((rcs_float >= 0) & (rcs_float < self.LG_LEN_IN_N_CELLS), axis=1)
+        rcs = np.where(valid[:, np.newaxis], rcs_float, 0).astype(int)
+
+        return rcs, valid
+
+    def rc2xy_many(self, rcs: npt.NDArray) -> npt.NDArray:
+        """Convert (N, 2) np img array indices (r, c) to (N, 2) world coordinates (x, y) at once."""
+        rcs = np.asarray(rcs).reshape(-1, 2)
+        xs = (
+            self.lg_xy[0]
+            - self._corner_offset_m
+            + (rcs[:, 1] - self._corner_offset_cells) * cfg.LG_MTR_PER_CELL
+        )
+        ys = (
+            self.lg_xy[1]
+            - self._row_sign * self._corner_offset_m
+            + self._row_sign * (rcs[:, 0] - self._corner_offset_cells) * cfg.LG_MTR_PER_CELL
+        )
 
-        rr, cc = draw.line(int(r0c0[0]), int(r0c0[1]), int(r1c1[0]), int(r1c1[1]))
+        return np.stack([xs, ys], axis=1)
 
-        '''
-        We need the if statements because the image datas have different channels in them.
-        Ideally we'd process the simmed dat to match the Spot channels.
-        '''
-        for r, c in zip(rr, cc):
-            if cfg.SCENARIO == Scenario.REAL:
-                if np.greater(
-                    self.img_data[r, c][0:2],
-                    [self.PIXEL_OCCUPIED_THRESHOLD, self.PIXEL_OCCUPIED_THRESHOLD],
-                ).any():
-                    collision_point = self.rc2xy((r, c))
+    @property
+    def occupied(self) -> npt.NDArray[np.bool_]:
+        """
+        Boolean (r, c) grid of occupied cells, decoded from the image once on first access.
+        Treat it as read only, it is shared by all checks on this local grid.
+        """
+        if self._occupied is None:
+            self._occupied = self._occupancy_decoder(self.img_data)
+
+        return self._occupied
+
+    @property
+    def occupancy_pyramid(self) -> list[npt.NDArray[np.bool_]]:
+        """
+        Coarser occupancy levels for LOS_PYRAMID_LEVELS, level l has cells of 2**l by 2**l cells.
+        A coarse cell is occupied if any of its cells is, and is then dilated with its 8 neighbours,
+        so a free coarse cell means every cell within 2**l - 1 cells of it is free.
+        Cells outside of the grid count as occupied, like they do for the LOS checks.
+        Level 0 is the occupancy itself.
+        """
+        if self._occupancy_pyramid is None:
+            levels = [self.occupied]
+            max_pooled = self.occupied
+            for _ in range(cfg.LOS_PYRAMID_LEVELS):
+                n_rows, n_cols = max_pooled.shape
+                padded = np.ones((n_rows + n_rows % 2, n_cols + n_cols % 2), dtype=bool)
+                padded[:n_rows, :n_cols] = max_pooled
+                max_pooled = padded.reshape(
+                    padded.shape[0] // 2, 2, padded.shape[1] // 2, 2
+                ).any(axis=(1, 3))
+                levels.append(
+                    ndimage.maximum_filter(max_pooled, size=3, mode="constant", cval=True)
+                )
+            self._occupancy_pyramid = levels
+
+        return self._occupancy_pyramid
+
+    def corridor_digests(
+        self, r0c0s: npt.NDArray, r1c1s: npt.NDArray, robot_radius: float = 0.0
+    ) -> list[bytes]:
+        """
+        Identifies the occupancy a LOS check between each pair of cells depends on,
+        the cells on the line dilated by the robot radius and where the grid was obtained,
+        so it stays the same when only cells away from the line change.
+        """
+        rr, cc, lengths = self.cells_on_straight_lines(r0c0s, r1c1s)
+        n_rows, n_cols = self.occupied.shape
 
-                    return False, collision_point
+        reach = int(np.ceil(robot_radius / cfg.LG_MTR_PER_CELL))
+        dr, dc = np.mgrid[-reach : reach + 1, -reach : reach + 1]
+        in_disk = dr**2 + dc**2 <= (robot_radius / cfg.LG_MTR_PER_CELL) ** 2
+        dr, dc = dr[in_disk], dc[in_disk]
 
-            elif cfg.SCENARIO == Scenario.SIM_MAZE_MEDIUM:
-                if np.greater(
-                    self.img_data[r, c][3],
-                    [self.PIXEL_OCCUPIED_THRESHOLD],
-                ).any():
-                    collision_point = self.rc2xy((r, c))
+        # (N, L, K) cells around each cell on the lines, the padding repeats the last cell
+        corridor_rr = rr[:, :, np.newaxis] + dr
+        corridor_cc = cc[:, :, np.newaxis] + dc
+        inside = (
+            (corridor_rr >= 0) & (corridor_rr < n_rows) & (corridor_cc >= 0) & (corridor_cc < n_cols)
+        )
+        # 0 free, 1 occupied, 2 outside of the grid
+        occupancy = np.full(corridor_rr.shape, 2, dtype=np.uint8)
+        occupancy[inside] = self.occupied[corridor_rr[inside], corridor_cc[inside]]
 
-                    return False, collision_point
+        ends = np.stack([rr[:, 0], cc[:, 0], rr[:, -1], cc[:, -1]], axis=1)
+        digests = []
+        for line_ends, n_cells, corridor in zip(ends, lengths, occupancy):
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(np.asarray(self.lg_xy, dtype=float).tobytes())
+            digest.update(np.append(line_ends, reach).tobytes())
+            digest.update(corridor[:n_cells].tobytes())
+            digests.append(digest.digest())
 
+        return digests
+
+    @property
+    def clearance(self) -> npt.NDArray[np.float64]:
+        """
+        Distance in meters from each cell to the closest occupied cell, 0 on occupied cells.
+        Computed once on first access with a euclidean distance transform.
+        """
+        if self._clearance is None:
+            if self.occupied.any():
+                self._clearance = (
+                    ndimage.distance_transform_edt(~self.occupied) * cfg.LG_MTR_PER_CELL
+                )
             else:
-                if np.less(
-                    self.img_data[r, c],
-                    [
-                        self.PIXEL_OCCUPIED_THRESHOLD,
-                        self.PIXEL_OCCUPIED_THRESHOLD,
-                        self.PIXEL_OCCUPIED_THRESHOLD,
-                        self.PIXEL_OCCUPIED_THRESHOLD,
-                    ],
-                ).any():
-                    collision_point = self.rc2xy((r, c))
-                    
-                    return False, collision_point
-
-        return True, None
+                self._clearance = np.full(self.occupied.shape, np.inf)
+
+        return self._clearance
+
+    @staticmethod
+    def cells_on_straight_lines(
+        r0c0s: npt.NDArray, r1c1s: npt.NDArray
+    ) -> tuple[npt.NDArray, npt.NDArray, npt.NDArray]:
+        """
+        Rasterize N lines at once, returns (N, L) arrays of row and column indices padded with
+        the last cell of each line, and the number of cells on each line.
+        Gives the same cells as skimage.draw.line, which rounds halfway points away from the start.
+        """
+        r0c0s = np.asarray(r0c0s, dtype=int).reshape(-1, 2)
+        r1c1s = np.asarray(r1c1s, dtype=int).reshape(-1, 2)
+
+        deltas = r1c1s - r0c0s  # (N, 2)
+        n_steps = np.abs(deltas).max(axis=1)  # (N,)
+        lengths = n_steps + 1
+
+        steps = np.minimum(np.arange(lengths.max(initial=1)), n_steps[:, np.newaxis])  # (N, L)
+        # round(step * delta / n_steps) with halves away from zero, in integer arithmetic
+        numerators = steps[:, :, np.newaxis] * deltas[:, np.newaxis, :]  # (N, L, 2)
+        denominators = np.maximum(n_steps, 1)[:, np.newaxis, np.newaxis]
+        offsets = np.sign(numerators) * (
+            (2 * np.abs(numerators) + denominators) // (2 * denominators)
+        )
+        cells = r0c0s[:, np.newaxis, :] + offsets
+
+        return cells[..., 0], cells[..., 1], lengths
+
+    def first_collisions_along_lines(
+        self,
+        rr: npt.NDArray,
+        cc: npt.NDArray,
+        lengths: npt.NDArray,
+        robot_radius: float = 0.0,
+    ) -> npt.NDArray:
+        """
+        Gather the occupancy along (N, L) padded lines of cells,
+        returns for each line the index of the first blocked cell, or -1 if the line is free.
+        With a robot radius, cells with a clearance up to that radius are blocked as well.
+        Cells outside of the grid count as blocked.
+        """
+        if cfg.LOS_PYRAMID_LEVELS > 0 and robot_radius <= 0:
+            return self._first_collisions_along_lines_coarse_to_fine(rr, cc, lengths)
+
+        return self._first_collisions_cell_by_cell(rr, cc, lengths, robot_radius)
+
+    def _first_collisions_cell_by_cell(
+        self,
+        rr: npt.NDArray,
+        cc: npt.NDArray,
+        lengths: npt.NDArray,
+        robot_radius: float = 0.0,
+    ) -> npt.NDArray:
+        if robot_radius > 0:
+            blocked_cells = self.clearance <= robot_radius
+        else:
+            blocked_cells = self.occupied
+
+        return self.first_collisions_in_grids(blocked_cells[np.newaxis], rr, cc, lengths)[0]
+
+    @staticmethod
+    def first_collisions_in_grids(
+        blocked_cells: npt.NDArray[np.bool_],
+        rr: npt.NDArray,
+        cc: npt.NDArray,
+        lengths: npt.NDArray,
+    ) -> npt.NDArray:
+        """
+        The same (N, L) padded lines in a stack of G equally sized grids of blocked cells,
+        returns (G, N) indices of the first blocked cell, or -1 where the line is free in that grid.
+        Cells outside of the grids count as blocked.
+        """
+        _, n_rows, n_cols = blocked_cells.shape
+
+        inside = (rr >= 0) & (rr < n_rows) & (cc >= 0) & (cc < n_cols)
+        blocked = np.repeat(~inside[np.newaxis], len(blocked_cells), axis=0)
+        blocked[:, inside] = blocked_cells[:, rr[inside], cc[inside]]
+        blocked &= np.arange(rr.shape[1]) < lengths[:, np.newaxis]
+
+        first_collision = np.argmax(blocked, axis=2)
+        first_collision[~blocked.any(axis=2)] = -1
+        return first_collision
+
+    def _first_collisions_along_lines_coarse_to_fine(
+        self, rr: npt.NDArray, cc: npt.NDArray, lengths: npt.NDArray
+    ) -> npt.NDArray:
+        """
+        Same result as first_collisions_along_lines, but lines are first tested on the occupancy pyramid.
+        At level l a line is split in blocks of 2**l cells, every cell of a block lies within 2**l - 1
+        cells of its first cell, so the whole block is free if the coarse cell of that first cell is.
+        Only the cells of blocks that stay blocked are refined on the next finer level,
+        and only those remaining cells are tested one by one at level 0.
+        """
+        n_rows, n_cols = self.occupied.shape
+        n_lines, max_length = rr.shape
+        # cells that might still be blocked, the others are known to be free
+        unresolved = np.arange(max_length) < lengths[:, np.newaxis]
+
+        for level in range(len(self.occupancy_pyramid) - 1, 0, -1):
+            stride = 2**level
+            n_blocks = -(-max_length // stride)
+            padded = np.zeros((n_lines, n_blocks * stride), dtype=bool)
+            padded[:, :max_length] = unresolved
+            line_ids, block_ids = np.nonzero(padded.reshape(n_lines, n_blocks, stride).any(axis=2))
+            if len(line_ids) == 0:
+                return np.full(n_lines, -1)
+
+            rr_first = rr[line_ids, block_ids * stride]
+            cc_first = cc[line_ids, block_ids * stride]
+            inside = (rr_first >= 0) & (rr_first < n_rows) & (cc_first >= 0) & (cc_first < n_cols)
+            blocked = ~inside
+            blocked[inside] = self.occupancy_pyramid[level][
+                rr_first[inside] // stride, cc_first[inside] // stride
+            ]
+
+            padded[:] = False
+            padded.reshape(n_lines, n_blocks, stride)[
+                line_ids[blocked], block_ids[blocked]
+            ] = True
+            unresolved &= padded[:, :max_length]
+
+        line_ids, steps = np.nonzero(unresolved)
+        rr_left, cc_left = rr[line_ids, steps], cc[line_ids, steps]
+        inside = (rr_left >= 0) & (rr_left < n_rows) & (cc_left >= 0) & (cc_left < n_cols)
+        blocked = ~inside
+        blocked[inside] = self.occupied[rr_left[inside], cc_left[inside]]
+
+        # np.nonzero goes row by row, so the first blocked cell of a line comes first
+        first_collision = np.full(n_lines, -1)
+        lines_hit, first_hits = np.unique(line_ids[blocked], return_index=True)
+        first_collision[lines_hit] = steps[blocked][first_hits]
+        return first_collision
+
+    def are_collision_free_straight_lines_between_cells(
+        self, r0c0s: npt.NDArray, r1c1s: npt.NDArray, robot_radius: float = 0.0
+    ) -> tuple[npt.NDArray[np.bool_], npt.NDArray]:
+        """
+        Batch version of is_collision_free_straight_line_between_cells for N lines.
+        Returns for each line whether it is collision free for a robot of the given radius,
+        and an (N, 2) array with the cell of the first collision, which is (-1, -1) for the free lines.
+        """
+        rr, cc, lengths = self.cells_on_straight_lines(r0c0s, r1c1s)
+        first_collision = self.first_collisions_along_lines(rr, cc, lengths, robot_radius)
+
+        is_free = first_collision < 0
+        line_idxs = np.arange(len(first_collision))
+        collision_cells = np.stack(
+            [rr[line_idxs, first_collision], cc[line_idxs, first_collision]], axis=1
+        )
+        collision_cells[is_free] = -1
+
+        return is_free, collision_cells
+
+    def is_collision_free_straight_line_between_cells(
+        self, r0c0: tuple[int, int], r1c1: tuple[int, int]
+    ) -> tuple[bool, Optional[tuple[float, float]]]:
+        is_free, collision_cells = self.are_collision_free_straight_lines_between_cells(
+            np.array([r0c0]), np.array([r1c1])
+        )
+
+        if is_free[0]:
+            return True, None
+
+        collision_point = self.rc2xy(tuple(collision_cells[0]))
+        return False, collision_point
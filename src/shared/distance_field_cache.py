@@ -0,0 +1,101 @@
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+import networkx as nx
+
+from src.shared.types.node_and_edge import Node
+
+
+@dataclass
+class DistanceField:
+    """The path cost from a single source to every reachable node, and the predecessors on those paths."""
+
+    source: Node
+    distance: dict[Node, float]
+    predecessors: dict[Node, list[Node]]
+    nbytes: int
+
+    def path_to(self, target: Node) -> Optional[list[Node]]:
+        """returns the nodes on the shortest path from the source to target, None if unreachable"""
+        if target not in self.distance:
+            return None
+
+        # the first predecessor is the one which set the final distance, following those
+        # gives the dijkstra tree, other equal cost predecessors can form zero cost cycles
+        path = [target]
+        while path[-1] != self.source:
+            path.append(self.predecessors[path[-1]][0])
+        path.reverse()
+
+        return path
+
+
+class DistanceFieldCache:
+    """
+    LRU cache of single source dijkstra results on a situational graph.
+    Keyed by source node, capabilities of the (filtered) graph and graph version,
+    so any change to the graph makes the old fields unreachable.
+    """
+
+    DEFAULT_MAX_BYTES = 64 * 2**20
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._fields: OrderedDict[Hashable, DistanceField] = OrderedDict()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def lookup(
+        self, source: Node, capabilities: Optional[frozenset], version: int
+    ) -> Optional[DistanceField]:
+        """returns the cached field for the source if there is one, without computing it"""
+        key = (source, capabilities, version)
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+            self.hits += 1
+
+        return field
+
+    def get(
+        self,
+        graph: nx.MultiDiGraph,
+        source: Node,
+        capabilities: Optional[frozenset],
+        version: int,
+    ) -> DistanceField:
+        """returns the field for the source, computing and caching it on a miss"""
+        field = self.lookup(source, capabilities, version)
+        if field is not None:
+            return field
+
+        self.misses += 1
+        predecessors, distance = nx.dijkstra_predecessor_and_distance(
+            graph, source, weight="cost"
+        )
+        nbytes = (
+            sys.getsizeof(distance)
+            + sys.getsizeof(predecessors)
+            + sum(sys.getsizeof(pred) for pred in predecessors.values())
+        )
+        field = DistanceField(source, distance, predecessors, nbytes)
+
+        self._evict_outdated(version)
+        self._fields[(source, capabilities, version)] = field
+        self._nbytes += nbytes
+        while self._nbytes > self.max_bytes and len(self._fields) > 1:
+            _, evicted = self._fields.popitem(last=False)
+            self._nbytes -= evicted.nbytes
+
+        return field
+
+    def _evict_outdated(self, version: int) -> None:
+        """the version only goes up, so fields of older versions can never be hit again"""
+        for key in [key for key in self._fields if key[2] != version]:
+            self._nbytes -= self._fields.pop(key).nbytes
@@ -1,12 +1,14 @@
 import logging
-from typing import Optional, Sequence
+from typing import Hashable, Optional, Sequence
 from uuid import uuid4
 
 import networkx as nx
 
+from src.shared.distance_field_cache import DistanceField, DistanceFieldCache
 from src.shared.prior_knowledge.affordance import Affordance
 from src.shared.prior_knowledge.sar_behaviors import Behaviors
 from src.shared.prior_knowledge.sar_situations import Situations
+from src.shared.spatial_hash import SpatialHash
 from src.shared.task import Task
 from src.shared.types.node_and_edge import Edge, Node
 
@@ -17,12 +19,35 @@ class SituationalGraph:
     tailored to missions centered around data collection and obtaining information
     """
 
+    NODE_INDEX_CELL_SIZE = 2.0  # [m]
+
     def __init__(self) -> None:
         self._log = logging.getLogger(__name__)
 
         self.G = nx.MultiDiGraph()
         self.tasks: list[Task] = []
 
+        # None for the full graph, the agent capabilities for a filtered graph
+        self.capabilities: Optional[frozenset] = None
+        self.distance_fields = DistanceFieldCache()
+        self._version = 0
+        self._source_graph: Optional[SituationalGraph] = None
+
+        # spatial index of the node positions and the nodes added since they were last taken, per type
+        self._node_index: dict[Situations, SpatialHash] = {}
+        self._new_nodes: dict[Situations, set[Node]] = {}
+
+        # the occupancy token of the data each shortcut (from, to) was last tested against,
+        # node ids are never reused so entries of removed nodes are simply never hit again
+        self._tested_shortcuts: dict[tuple[Node, Node], Hashable] = {}
+
+    @property
+    def version(self) -> int:
+        """Incremented on every change to the graph, a filtered graph follows the graph it filters."""
+        if self._source_graph:
+            return self._source_graph.version
+        return self._version
+
     """Calc stuff"""
 
     def calc_edge_len_between_nodes(self, a: Node, b: Node) -> float:
@@ -75,6 +100,23 @@ class SituationalGraph:
 
         return close_nodes
 
+    def get_nodes_of_type_in_box(
+        self, pos: tuple[float, float], half_width: float, node_type: Situations
+    ) -> list[Node]:
+        """
+        Same test as get_nodes_of_type_in_margin, but answered from the spatial index
+        so only the nodes in the buckets around the position are visited.
+        """
+        if node_type not in self._node_index:
+            return []
+        return self._node_index[node_type].query_box(pos, half_width)
+
+    def take_new_nodes_of_type(self, node_type: Situations) -> set[Node]:
+        """returns the nodes of a type added since the previous call, and starts collecting anew"""
+        new_nodes = self._new_nodes.get(node_type, set())
+        self._new_nodes[node_type] = set()
+        return new_nodes
+
     def get_edge_with_lowest_weight(self, a: Node, b: Node) -> Optional[Edge]:
         """returns the lowest weight edge between two nodes"""
         edge_data = self.G.get_edge_data(a, b)
@@ -138,8 +180,31 @@ class SituationalGraph:
         filtered_situational_graph = SituationalGraph()
         filtered_situational_graph.tasks = self.tasks
         filtered_situational_graph.G = filtered_G
+        filtered_situational_graph.capabilities = frozenset(capabilities)
+        filtered_situational_graph.distance_fields = self.distance_fields
+        filtered_situational_graph._source_graph = self
+        filtered_situational_graph._node_index = self._node_index
+        filtered_situational_graph._new_nodes = self._new_nodes
+        filtered_situational_graph._tested_shortcuts = self._tested_shortcuts
         return filtered_situational_graph
 
+    def get_distance_field(self, source: Node) -> DistanceField:
+        """returns the path costs and predecessors from source to all reachable nodes, cached per graph version"""
+        return self.distance_fields.get(
+            self.G, source, self.capabilities, self.version
+        )
+
+    def lookup_distance_field(self, source: Node) -> Optional[DistanceField]:
+        """returns the distance field from source only if it is already cached"""
+        return self.distance_fields.lookup(source, self.capabilities, self.version)
+
+    def is_shortcut_tested(self, a: Node, b: Node, occupancy_token: Hashable) -> bool:
+        """true if the shortcut from a to b was already tested against the same occupancy data"""
+        return self._tested_shortcuts.get((a, b)) == occupancy_token
+
+    def mark_shortcut_tested(self, a: Node, b: Node, occupancy_token: Hashable) -> None:
+        self._tested_shortcuts[(a, b)] = occupancy_token
+
     """Convert stuff"""
 
     def node_list_to_edge_list(self, node_list: Sequence[Node]) -> list[Edge]:
@@ -175,6 +240,13 @@ class SituationalGraph:
     def add_node_of_type(self, pos: tuple[float, float], node_type: Situations) -> Node:
         node_uuid = uuid4()
         self.G.add_node(node_uuid, pos=pos, type=node_type)
+        self._version += 1
+
+        if node_type not in self._node_index:
+            self._node_index[node_type] = SpatialHash(self.NODE_INDEX_CELL_SIZE)
+        self._node_index[node_type].insert(node_uuid, pos)
+        self._new_nodes.setdefault(node_type, set()).add(node_uuid)
+
         return node_uuid
 
     def add_edge_of_type(
@@ -195,6 +267,7 @@ class SituationalGraph:
             type=edge_type,
             cost=cost,
         )
+        self._version += 1
         return (a, b, edge_id)
 
     def add_waypoint_diedge(self, a: Node, b: Node) -> None:
@@ -204,7 +277,12 @@ class SituationalGraph:
     """Remove stuff"""
 
     def remove_node_and_tasks(self, a: Node):
+        node_type = self.G.nodes[a]["type"]
+        self._node_index[node_type].remove(a)
+        self._new_nodes.get(node_type, set()).discard(a)
+
         self.G.remove_node(a)  # also removes the edge
+        self._version += 1
         self.remove_tasks_associated_with_node(a)
 
     """Task manager stuff"""
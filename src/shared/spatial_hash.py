@@ -0,0 +1,126 @@
+import math
+from typing import Hashable, Iterator
+
+Cell = tuple[int, int]
+Pos = tuple[float, float]
+
+
+class SpatialHash:
+    """
+    Uniform grid of buckets over the plane for fast neighbourhood queries on 2D positions.
+    A query only visits the buckets overlapping the query region, so its cost depends on
+    the local density of entries and not on the total number of entries.
+    """
+
+    def __init__(self, cell_size: float) -> None:
+        if cell_size <= 0:
+            raise ValueError(f"cell_size must be positive, got {cell_size}")
+
+        self.cell_size = cell_size
+        self._buckets: dict[Cell, dict[Hashable, Pos]] = {}
+        self._key_to_cell: dict[Hashable, Cell] = {}
+
+    def __len__(self) -> int:
+        return len(self._key_to_cell)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._key_to_cell
+
+    def _cell_of(self, pos: Pos) -> Cell:
+        return math.floor(pos[0] / self.cell_size), math.floor(pos[1] / self.cell_size)
+
+    def insert(self, key: Hashable, pos: Pos) -> None:
+        """Insert a key at a position, moving it if it is already present."""
+        if key in self._key_to_cell:
+            self.remove(key)
+
+        cell = self._cell_of(pos)
+        self._buckets.setdefault(cell, {})[key] = pos
+        self._key_to_cell[key] = cell
+
+    def remove(self, key: Hashable) -> None:
+        """Remove a key, does nothing if the key is not present."""
+        cell = self._key_to_cell.pop(key, None)
+        if cell is None:
+            return
+
+        bucket = self._buckets[cell]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[cell]
+
+    def _items_in_cells(
+        self, pos: Pos, half_width: float
+    ) -> Iterator[tuple[Hashable, Pos]]:
+        i_min, j_min = self._cell_of((pos[0] - half_width, pos[1] - half_width))
+        i_max, j_max = self._cell_of((pos[0] + half_width, pos[1] + half_width))
+
+        for i in range(i_min, i_max + 1):
+            for j in range(j_min, j_max + 1):
+                bucket = self._buckets.get((i, j))
+                if bucket:
+                    yield from bucket.items()
+
+    def query_box(self, pos: Pos, half_width: float) -> list[Hashable]:
+        """Return the keys strictly within an axis aligned square around pos."""
+        return [
+            key
+            for key, key_pos in self._items_in_cells(pos, half_width)
+            if abs(pos[0] - key_pos[0]) < half_width
+            and abs(pos[1] - key_pos[1]) < half_width
+        ]
+
+    def query_radius(self, pos: Pos, radius: float) -> list[tuple[Hashable, float]]:
+        """Return (key, distance) pairs for all keys within radius of pos."""
+        close = []
+        for key, key_pos in self._items_in_cells(pos, radius):
+            dist = math.hypot(pos[0] - key_pos[0], pos[1] - key_pos[1])
+            if dist <= radius:
+                close.append((key, dist))
+
+        return close
+
+    def nearest(self, pos: Pos, k: int) -> list[tuple[Hashable, float]]:
+        """
+        Return up to k (key, distance) pairs closest to pos, sorted by distance.
+        Searches rings of buckets outwards until the k-th distance is settled.
+        """
+        if k <= 0 or not self._key_to_cell:
+            return []
+
+        centre = self._cell_of(pos)
+        # no bucket lies further away than the bounding box of all buckets
+        max_ring = max(
+            max(abs(i - centre[0]), abs(j - centre[1])) for i, j in self._buckets
+        )
+
+        found: list[tuple[Hashable, float]] = []
+        for ring in range(max_ring + 1):
+            for cell in self._ring_cells(centre, ring):
+                for key, key_pos in self._buckets.get(cell, {}).items():
+                    dist = math.hypot(pos[0] - key_pos[0], pos[1] - key_pos[1])
+                    found.append((key, dist))
+
+            # everything outside this ring is at least ring * cell_size away
+            settled_dist = ring * self.cell_size
+            if len(found) >= k:
+                found.sort(key=lambda item: item[1])
+                if found[k - 1][1] <= settled_dist:
+                    break
+
+        found.sort(key=lambda item: item[1])
+        return found[:k]
+
+    @staticmethod
+    def _ring_cells(centre: Cell, ring: int) -> Iterator[Cell]:
+        if ring == 0:
+            yield centre
+            return
+
+        i0, j0 = centre
+        for j in range(j0 - ring, j0 + ring + 1):
+            yield i0 - ring, j
+            yield i0 + ring, j
+        for i in range(i0 - ring + 1, i0 + ring):
+            yield i, j0 - ring
+            yield i, j0 + ring
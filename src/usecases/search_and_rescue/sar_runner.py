@@ -1,9 +1,12 @@
+import asyncio
+
 from src.config import Scenario, cfg
 from src.mission_autonomy.mission_runner import MissionRunner
 from src.operator import operator_runner
 from src.platform_autonomy.control.real.spot_agent import SpotAgent
 from src.platform_autonomy.control.sim.simulated_agent import SimulatedAgent
 from src.platform_autonomy.platform_runner import PlatformRunner
+from src.platform_autonomy.state.global_occupancy_map import GlobalOccupancyMap
 from src.shared.prior_knowledge.sar_capabilities import Capabilities
 from src.shared.situational_graph import SituationalGraph
 from src.usecases.search_and_rescue.exploration_mission_initializer import (
@@ -29,6 +32,11 @@ def run_usecase():
         ]  # make the first agent only posses the capabilities
         agents.extend([SimulatedAgent(set(), i) for i in range(1, cfg.NUM_AGENTS)])
 
+    if cfg.GLOBAL_MAP:
+        global_map = GlobalOccupancyMap()
+        for agent in agents:
+            agent.global_map = global_map
+
     # TODO: make it so that here we can also load an existing situational_graph.
     situational_graph = SituationalGraph()
 
@@ -36,4 +44,7 @@ def run_usecase():
 
     mission_runner = MissionRunner(agents, situational_graph, mission_initializer)
     
-    mission_runner.mission_main_loop(agents, situational_graph)
+    if cfg.ASYNC_MISSION:
+        asyncio.run(mission_runner.mission_main_loop_async(agents, situational_graph))
+    else:
+        mission_runner.mission_main_loop(agents, situational_graph)
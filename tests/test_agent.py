@@ -67,3 +67,22 @@ def test_calc_heading_to_target_90_agent_at_0_0():
     heading = agent.calc_heading_to_target(target_pos)
 
     assert heading == np.pi * 0.5
+
+
+def test_local_grid_is_reused_until_the_agent_moves():
+    agent = SimulatedAgent()
+    agent.at_wp = None
+    calls = []
+    agent._get_local_grid_img = lambda: calls.append(agent.pos) or np.zeros((2, 2))
+
+    lg = agent.get_local_grid()
+    assert agent.get_local_grid() is lg
+    assert len(calls) == 1
+
+    agent.move_to_pos((agent.pos[0] + 0.1, agent.pos[1]))
+    assert agent.get_local_grid() is not lg
+    assert len(calls) == 2
+
+    agent.invalidate_local_grid()
+    agent.get_local_grid()
+    assert len(calls) == 3
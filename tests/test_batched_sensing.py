@@ -0,0 +1,92 @@
+import asyncio
+import gc
+import weakref
+
+import numpy as np
+
+from src.config import cfg
+from src.core.event_system import subscriptions
+from src.core.topics import Topics
+from src.platform_autonomy.control.sim.batched_sensing import BatchedSimSensing
+from src.platform_autonomy.control.sim.simulated_agent import SimulatedAgent
+from src.platform_autonomy.state.frontier_sampling_strategies import (
+    _sampling_cache,
+    create_frontier_sampling_strategy,
+)
+from src.platform_autonomy.state.local_grid import LocalGrid
+from src.shared.situational_graph import SituationalGraph
+
+
+def test_batched_sensing_matches_sensing_one_by_one(monkeypatch):
+    monkeypatch.setattr(cfg, "BATCHED_SIM_SENSING", True)
+    monkeypatch.setattr(cfg, "NUM_AGENTS", 2)
+    monkeypatch.setattr(cfg, "FRONTIER_SAMPLING_CACHE_SIZE", 0)
+    agents = [SimulatedAgent(), SimulatedAgent()]
+    agents[1].pos = (agents[0].pos[0] + 1.0, agents[0].pos[1])
+    _sampling_cache.clear()
+
+    BatchedSimSensing().sense(agents, SituationalGraph())
+    assert len(_sampling_cache) == 2
+
+    strategy = create_frontier_sampling_strategy()
+    for agent in agents:
+        # the sync and the async mode both take the primed grid
+        lg = agent.get_local_grid() if agent is agents[0] else asyncio.run(agent.get_local_grid_async())
+        assert agent._primed_local_grid is None
+
+        unbatched = LocalGrid(agent.pos, agent._get_local_grid_img())
+        assert np.array_equal(lg.occupied, unbatched.occupied)
+
+        hits = _sampling_cache.hits
+        assert strategy.sample_frontiers(lg) == strategy._sample_frontier_cells(unbatched)[0]
+        assert _sampling_cache.hits == hits + 1
+
+    # the primed samplings are used once, they do not turn the cache on
+    assert len(_sampling_cache) == 0
+
+
+def test_primed_grids_are_dropped_when_the_map_changes(monkeypatch):
+    monkeypatch.setattr(cfg, "BATCHED_SIM_SENSING", True)
+    agent = SimulatedAgent()
+    _sampling_cache.clear()
+
+    BatchedSimSensing().sense([agent], SituationalGraph())
+    agent.lg_spoofer.set_map(cfg.MAP_PATH)
+
+    assert agent._primed_local_grid is None
+    assert len(_sampling_cache) == 0
+
+
+def test_creating_agents_neither_posts_a_map_change_nor_subscribes(monkeypatch):
+    monkeypatch.setattr(cfg, "FRONTIER_SAMPLING_CACHE_SIZE", 8)
+    SimulatedAgent()
+    n_subscribers = len(subscriptions[Topics.SIM__MAP_CHANGED])
+    _sampling_cache.clear()
+    _sampling_cache._put(("some", "key"), ([], []))
+
+    agent = SimulatedAgent()
+    assert len(subscriptions[Topics.SIM__MAP_CHANGED]) == n_subscribers
+    assert ("some", "key") in _sampling_cache
+
+    agent_ref = weakref.ref(agent)
+    del agent
+    gc.collect()
+    assert agent_ref() is None
+
+
+def test_primes_are_kept_for_their_sensor_epoch_only():
+    agent = SimulatedAgent()
+    agent.at_wp = None
+    start, target = agent.pos, (agent.pos[0] + 1.0, agent.pos[1])
+    at_target = LocalGrid(target, agent.lg_spoofer.sim_spoof_local_grid_from_img_world(target))
+
+    agent.prime_local_grid(at_target, after_move=True)
+    agent.move_to_pos(target)
+    assert agent.get_local_grid() is at_target
+
+    # a prime for a move which does not happen is stale once the next step starts
+    agent.prime_local_grid(LocalGrid(start, at_target.img_data), after_move=True)
+    agent.invalidate_local_grid()
+    assert agent._primed_local_grid is not None
+    agent.invalidate_local_grid()
+    assert agent._primed_local_grid is None
@@ -0,0 +1,31 @@
+from src.shared.prior_knowledge.sar_behaviors import Behaviors
+from src.shared.prior_knowledge.sar_situations import Situations
+from src.shared.situational_graph import SituationalGraph
+
+
+def test_distance_field_is_reused_until_graph_changes():
+    sg = SituationalGraph()
+    a = sg.add_node_of_type((0, 0), Situations.WAYPOINT)
+    b = sg.add_node_of_type((3, 4), Situations.WAYPOINT)
+    sg.add_waypoint_diedge(a, b)
+
+    field = sg.get_distance_field(a)
+    assert field.distance[b] == 5
+    assert sg.get_distance_field(a) is field
+    assert sg.get_filtered_graph(set()).get_distance_field(a) is not field
+
+    c = sg.add_node_of_type((3, 0), Situations.WAYPOINT)
+    sg.add_waypoint_diedge(a, c)
+    assert sg.lookup_distance_field(a) is None
+    assert sg.get_distance_field(a).distance[c] == 3
+
+
+def test_path_to_ignores_zero_cost_selfloop():
+    sg = SituationalGraph()
+    a = sg.add_node_of_type((0, 0), Situations.WAYPOINT)
+    b = sg.add_node_of_type((1, 0), Situations.WAYPOINT)
+    sg.add_edge_of_type(a, a, Behaviors.EXPLORE)
+    sg.add_waypoint_diedge(a, b)
+
+    assert sg.get_distance_field(a).path_to(b) == [a, b]
+    assert sg.get_distance_field(a).path_to(a) == [a]
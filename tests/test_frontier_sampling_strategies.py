@@ -0,0 +1,92 @@
+import numpy as np
+
+from src.config import Scenario, cfg
+from src.core.event_system import post_event
+from src.core.topics import Topics
+from src.platform_autonomy.state.frontier_sampling_strategies import (
+    AngularLOSFrontierSamplingStrategy,
+    BoundaryFrontierSamplingStrategy,
+    RingFrontierSamplingStrategy,
+    _sampling_cache,
+    estimate_openness,
+    n_samples_for,
+)
+from src.platform_autonomy.state.local_grid import LocalGrid
+
+
+def test_boundary_frontiers_lie_on_the_sample_radius_in_view(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    n = int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL)
+    img = np.full((n, n, 4), 255, dtype=np.uint8)
+    img[:, : n // 2 - 5] = 0  # everything left of the agent is a wall
+    lg = LocalGrid((0, 0), img)
+
+    frontiers = BoundaryFrontierSamplingStrategy().sample_frontiers(lg)
+    angular_frontiers = AngularLOSFrontierSamplingStrategy().sample_frontiers(lg)
+
+    assert len(frontiers) > 1
+    centre = n // 2
+    dists = np.hypot(*(np.array(frontiers) - centre).T)
+    assert np.all(np.abs(dists - cfg.FRONTIER_SAMPLE_RADIUS_NUM_CELLS) <= 1.5)
+    assert all(c >= n // 2 - 5 for _, c in frontiers + angular_frontiers)
+    assert lg.are_collision_free_straight_lines_between_cells(
+        np.tile((centre, centre), (len(frontiers), 1)), np.array(frontiers)
+    )[0].all()
+
+
+def test_ring_keeps_the_farthest_free_radius_of_blocked_rays(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    monkeypatch.setattr(cfg, "SAMPLE_RING_WIDTH", 1.0)
+    n = int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL)
+    img = np.full((n, n, 4), 255, dtype=np.uint8)
+    wall_col = n // 2 + cfg.FRONTIER_SAMPLE_RADIUS_NUM_CELLS * 3 // 4
+    img[:, wall_col] = 0  # a wall at three quarters of the sample radius to the right
+    lg = LocalGrid((0, 0), img)
+
+    angular_frontiers = AngularLOSFrontierSamplingStrategy().sample_frontiers(lg)
+    ring_frontiers = RingFrontierSamplingStrategy().sample_frontiers(lg)
+
+    assert len(ring_frontiers) > len(angular_frontiers)
+    assert set(angular_frontiers) <= set(ring_frontiers)
+    assert all(c < wall_col for _, c in ring_frontiers)
+
+
+def test_fewer_samples_in_a_corridor(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    monkeypatch.setattr(cfg, "ADAPTIVE_N_SAMPLES", True)
+    n = int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL)
+    hall = np.full((n, n, 4), 255, dtype=np.uint8)
+    corridor = hall.copy()
+    corridor[: n // 2 - 20] = 0
+    corridor[n // 2 + 20 :] = 0
+
+    hall_lg, corridor_lg = LocalGrid((0, 0), hall), LocalGrid((0, 0), corridor)
+
+    assert estimate_openness(hall_lg) == 1.0
+    assert estimate_openness(corridor_lg) < 0.5
+    assert n_samples_for(hall_lg) == cfg.ADAPTIVE_N_SAMPLES_MAX
+    assert n_samples_for(corridor_lg) < n_samples_for(hall_lg)
+
+
+def test_sampling_cache_reuses_results_until_the_map_changes(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    monkeypatch.setattr(cfg, "FRONTIER_SAMPLING_CACHE_SIZE", 8)
+    n = int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL)
+    img = np.full((n, n, 4), 255, dtype=np.uint8)
+    img[:, n // 2 + 10] = 0
+    strategy = AngularLOSFrontierSamplingStrategy()
+    _sampling_cache.clear()
+    hits = _sampling_cache.hits
+
+    frontiers = strategy.sample_frontiers(LocalGrid((0, 0), img))
+    assert strategy.sample_frontiers(LocalGrid((0, 0), img.copy())) == frontiers
+    assert _sampling_cache.hits == hits + 1
+
+    # different surroundings at the same pose are sampled again
+    moved_wall = img.copy()
+    moved_wall[:, n // 2 + 10] = 255
+    assert strategy.sample_frontiers(LocalGrid((0, 0), moved_wall)) != frontiers
+    assert _sampling_cache.hits == hits + 1
+
+    post_event(Topics.SIM__MAP_CHANGED, "another map")
+    assert len(_sampling_cache) == 0
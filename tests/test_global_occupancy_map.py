@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from src.config import Scenario, cfg
+from src.platform_autonomy.state.global_occupancy_map import GlobalOccupancyMap
+from src.platform_autonomy.state.local_grid import LocalGrid
+
+
+@pytest.fixture
+def sim_villa(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+
+
+def make_local_grid(xy, wall_col=None):
+    n = int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL)
+    img = np.full((n, n, 4), 255, dtype=np.uint8)
+    if wall_col is not None:
+        img[:, wall_col] = 0
+
+    return LocalGrid(xy, img)
+
+
+def test_line_of_sight_across_tiles(sim_villa):
+    gmap = GlobalOccupancyMap(tile_size=16)
+    gmap.fuse(make_local_grid((0, 0)))
+    assert len(gmap) > 4
+
+    half = cfg.LG_LEN_IN_M / 2 * 0.9
+    is_free, collision_xys = gmap.are_collision_free_straight_lines(
+        np.array([[-half, -half], [0, 0]]),
+        np.array([[half, half], [3 * half, 0]]),  # the second ends in unknown space
+    )
+
+    assert is_free.tolist() == [True, False]
+    assert np.isnan(collision_xys[0]).all()
+    assert collision_xys[1][0] == pytest.approx(cfg.LG_LEN_IN_M / 2, abs=2 * gmap.cell_size)
+
+
+def test_fusing_a_wall_blocks_and_updates_versions(sim_villa):
+    gmap = GlobalOccupancyMap(tile_size=16)
+    gmap.fuse(make_local_grid((0, 0)))
+    versions = dict(gmap._tile_versions)
+
+    gmap.fuse(make_local_grid((0, 0)))
+    assert gmap._tile_versions == versions
+
+    lg = make_local_grid((0, 0), wall_col=int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL) // 2)
+    gmap.fuse(lg)
+    assert gmap._tile_versions != versions
+
+    offset = cfg.LG_LEN_IN_M / 4
+    is_free, _ = gmap.are_collision_free_straight_lines(
+        np.array([[-offset, 0], [-offset, 0]]), np.array([[offset, 0], [-offset, offset]])
+    )
+    assert is_free.tolist() == [False, True]
+
+    wall_x = lg.rc2xy((0, int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL) // 2))[0]
+    clearance = gmap.clearance(np.array([[wall_x - 5 * gmap.cell_size, 0]]), max_range=1.0)
+    assert clearance[0] == pytest.approx(5 * gmap.cell_size, abs=1.5 * gmap.cell_size)
+
+
+def test_tiles_are_evicted(sim_villa):
+    gmap = GlobalOccupancyMap(tile_size=16, max_tiles=10)
+    gmap.fuse(make_local_grid((0, 0)))
+
+    assert len(gmap) == 10
+    assert gmap.nbytes == 10 * 16**2
+
+
+def test_far_apart_pairs_are_checked_in_small_windows(sim_villa, monkeypatch):
+    gmap = GlobalOccupancyMap(tile_size=16)
+    far = 20 * cfg.LG_LEN_IN_M
+    gmap.fuse(make_local_grid((0, 0), wall_col=int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL) // 2))
+    gmap.fuse(make_local_grid((far, far)))
+
+    window_sizes = []
+    window = gmap.window
+    monkeypatch.setattr(
+        gmap, "window", lambda ij_min, ij_max: window_sizes.append(np.prod(ij_max - ij_min + 1))
+        or window(ij_min, ij_max)
+    )
+
+    offset = cfg.LG_LEN_IN_M / 4
+    xy0s = np.array([[-offset, 0], [-offset, 0], [far - offset, far]])
+    xy1s = np.array([[offset, 0], [-offset, offset], [far + offset, far]])
+    is_free, collision_xys = gmap.are_collision_free_straight_lines(xy0s, xy1s, robot_radius=0.2)
+    clearance = gmap.clearance(np.concatenate([collision_xys[:1], xy0s[2:], xy1s[2:]]), 1.0)
+
+    assert is_free.tolist() == [False, True, True]
+    assert np.isnan(collision_xys[1:]).all() and not np.isnan(collision_xys[0]).any()
+    assert clearance[0] <= 0.2 and np.isinf(clearance[1:]).all()
+    assert max(window_sizes) < (far / gmap.cell_size) ** 2 / 100
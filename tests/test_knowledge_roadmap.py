@@ -6,3 +6,38 @@ def test_get_node_by_pos():
     krm = SituationalGraph()
     node = krm.add_node_of_type((55, 55), Situations.WAYPOINT)
     assert node == krm.get_node_by_exact_pos((55, 55))
+
+
+def test_get_nodes_of_type_in_box_matches_margin():
+    krm = SituationalGraph()
+    for i in range(30):
+        krm.add_node_of_type((i * 0.7, (i * 3) % 7), Situations.FRONTIER)
+        krm.add_node_of_type((i * 0.5, (i * 5) % 7), Situations.WAYPOINT)
+
+    in_margin = krm.get_nodes_of_type_in_margin((6, 3), 2.5, Situations.FRONTIER)
+    in_box = krm.get_nodes_of_type_in_box((6, 3), 2.5, Situations.FRONTIER)
+
+    assert set(in_box) == set(in_margin)
+
+
+def test_take_new_nodes_of_type():
+    krm = SituationalGraph()
+    a = krm.add_node_of_type((0, 0), Situations.FRONTIER)
+    b = krm.add_node_of_type((1, 0), Situations.FRONTIER)
+    krm.remove_node_and_tasks(b)
+
+    assert krm.take_new_nodes_of_type(Situations.FRONTIER) == {a}
+    assert krm.take_new_nodes_of_type(Situations.FRONTIER) == set()
+
+
+def test_tested_shortcuts_are_remembered_per_occupancy_token():
+    krm = SituationalGraph()
+    a = krm.add_node_of_type((0, 0), Situations.WAYPOINT)
+    b = krm.add_node_of_type((1, 0), Situations.WAYPOINT)
+
+    krm.mark_shortcut_tested(a, b, "scan 1")
+
+    filtered = krm.get_filtered_graph(set())
+    assert filtered.is_shortcut_tested(a, b, "scan 1")
+    assert not filtered.is_shortcut_tested(b, a, "scan 1")
+    assert not filtered.is_shortcut_tested(a, b, "scan 2")
@@ -1,7 +1,7 @@
 import numpy as np
 import pytest
 
-from src.config import cfg
+from src.config import Scenario, cfg
 from src.platform_autonomy.state.local_grid import LocalGrid
 
 
@@ -22,3 +22,119 @@ def test_transformation_back_to_back2():
     a = (10, 10)
     b = lg.xy2rc(a)
     assert a == pytest.approx(lg.rc2xy(b), 0.1)
+
+
+def test_batch_line_cells_match_skimage():
+    from skimage import draw
+
+    rng = np.random.default_rng(0)
+    r0c0s = rng.integers(0, 100, size=(200, 2))
+    r1c1s = rng.integers(0, 100, size=(200, 2))
+
+    rr, cc, lengths = LocalGrid.cells_on_straight_lines(r0c0s, r1c1s)
+
+    for i in range(len(r0c0s)):
+        rr_ref, cc_ref = draw.line(*r0c0s[i], *r1c1s[i])
+        assert np.array_equal(rr[i, : lengths[i]], rr_ref)
+        assert np.array_equal(cc[i, : lengths[i]], cc_ref)
+
+
+def test_batch_collision_check(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    img = np.full((20, 20, 4), 255, dtype=np.uint8)
+    img[5:15, 10] = 0  # vertical wall
+    lg = LocalGrid((0, 0), img)
+
+    is_free, collision_cells = lg.are_collision_free_straight_lines_between_cells(
+        np.array([[10, 2], [10, 2], [2, 2], [2, 2]]),
+        np.array([[10, 18], [10, 8], [2, 18], [2, 25]]),  # last leaves the grid
+    )
+
+    assert is_free.tolist() == [False, True, True, False]
+    assert collision_cells[0].tolist() == [10, 10]
+    assert collision_cells[1].tolist() == [-1, -1]
+    assert collision_cells[3].tolist() == [2, 20]
+    assert lg.is_collision_free_straight_line_between_cells((10, 2), (10, 18))[0] is False
+
+
+def test_occupied_uses_custom_decoder():
+    img = np.zeros((20, 20), dtype=np.uint8)
+    img[3, 4] = 1
+    lg = LocalGrid((0, 0), img, occupancy_decoder=lambda img_data: img_data > 0)
+
+    assert lg.occupied.dtype == bool
+    assert lg.occupied.sum() == 1 and lg.occupied[3, 4]
+    assert lg.occupied is lg.occupied
+
+
+def test_clearance_aware_collision_check(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    img = np.full((20, 20, 4), 255, dtype=np.uint8)
+    lg = LocalGrid((0, 0), img)
+    assert np.isinf(lg.clearance).all()
+
+    img[10, 10] = 0
+    lg = LocalGrid((0, 0), img)
+    assert lg.clearance[10, 13] == pytest.approx(3 * cfg.LG_MTR_PER_CELL)
+
+    # a line passing two cells from the obstacle
+    r0c0s, r1c1s = np.array([[12, 2]]), np.array([[12, 18]])
+    assert lg.are_collision_free_straight_lines_between_cells(r0c0s, r1c1s)[0][0]
+    is_free, collision_cells = lg.are_collision_free_straight_lines_between_cells(
+        r0c0s, r1c1s, robot_radius=2.5 * cfg.LG_MTR_PER_CELL
+    )
+    assert not is_free[0]
+    assert collision_cells[0].tolist() == [12, 9]
+
+
+def test_many_transformations_match_single():
+    lg = LocalGrid((9, 9), np.array([]))
+    xys = np.array([(10.0, 10.0), (8.2, 9.7), (9, 9), (9 + cfg.LG_LEN_IN_M, 9)])
+
+    rcs, valid = lg.xy2rc_many(xys)
+
+    assert valid.tolist() == [True, True, True, False]
+    for xy, rc in zip(xys[valid], rcs[valid]):
+        assert lg.xy2rc(tuple(xy)) == tuple(rc)
+    assert lg.rc2xy_many(rcs[valid]) == pytest.approx(xys[valid], abs=cfg.LG_MTR_PER_CELL)
+    with pytest.raises(ValueError):
+        lg.xy2rc(tuple(xys[3]))
+
+
+@pytest.mark.parametrize("levels", [1, 3])
+def test_coarse_to_fine_collision_check_matches_cell_by_cell(monkeypatch, levels):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    rng = np.random.default_rng(0)
+    img = np.full((61, 61, 4), 255, dtype=np.uint8)
+    img[rng.random((61, 61)) < 0.01] = 0
+    r0c0s, r1c1s = rng.integers(-2, 63, (2, 500, 2))
+
+    exact = LocalGrid((0, 0), img).are_collision_free_straight_lines_between_cells(r0c0s, r1c1s)
+    monkeypatch.setattr(cfg, "LOS_PYRAMID_LEVELS", levels)
+    lg = LocalGrid((0, 0), img)
+    coarse_to_fine = lg.are_collision_free_straight_lines_between_cells(r0c0s, r1c1s)
+
+    assert len(lg.occupancy_pyramid) == levels + 1
+    assert exact[0].any() and not exact[0].all()
+    assert np.array_equal(exact[0], coarse_to_fine[0])
+    assert np.array_equal(exact[1], coarse_to_fine[1])
+
+
+def test_corridor_digest_only_changes_with_the_occupancy_near_the_line(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    img = np.full((61, 61, 4), 255, dtype=np.uint8)
+    radius = 2 * cfg.LG_MTR_PER_CELL
+    line = np.array([[30, 10]]), np.array([[30, 50]])
+
+    def digest(img):
+        return LocalGrid((0, 0), img).corridor_digests(*line, robot_radius=radius)[0]
+
+    far_away, within_radius, just_outside = img.copy(), img.copy(), img.copy()
+    far_away[5, 5] = 0
+    within_radius[32, 20] = 0
+    just_outside[33, 20] = 0
+
+    assert digest(far_away) == digest(img)
+    assert digest(just_outside) == digest(img)
+    assert digest(within_radius) != digest(img)
+    assert LocalGrid((1, 0), img).corridor_digests(*line, robot_radius=radius)[0] != digest(img)
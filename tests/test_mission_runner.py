@@ -0,0 +1,305 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.config import PlotLvl, Scenario, cfg
+from src.core import event_system
+from src.core.topics import Topics
+from src.mission_autonomy.mission_initializer import MissionInitializer
+from src.mission_autonomy.mission_runner import MissionRunner
+from src.operator import operator_runner
+from src.platform_autonomy.control.sim.simulated_agent import SimulatedAgent
+from src.platform_autonomy.execution.behaviors.explore_behavior import ExploreBehavior
+from src.platform_autonomy.platform_runner import PlatformRunner
+from src.shared.prior_knowledge.sar_capabilities import Capabilities
+from src.shared.prior_knowledge.sar_objectives import Objectives
+from src.shared.prior_knowledge.sar_situations import Situations
+from src.shared.prior_knowledge.sar_behaviors import Behaviors
+from src.shared.situational_graph import SituationalGraph
+from src.shared.task import Task
+from src.usecases.search_and_rescue.exploration_mission_initializer import (
+    ExplorationMissionInitializer,
+)
+from src.usecases.search_and_rescue.sar_affordances import SAR_AFFORDANCES
+from src.usecases.search_and_rescue.sar_behaviors import SAR_BEHAVIORS
+
+
+class StartWhereYouAre(MissionInitializer):
+    def initialize_mission(self, agents, situational_graph):
+        pass
+
+
+@pytest.fixture
+def slow_villa_mission(monkeypatch):
+    monkeypatch.setattr(event_system, "subscriptions", {})
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    monkeypatch.setattr(cfg, "NUM_AGENTS", 3)
+    monkeypatch.setattr(cfg, "MAX_STEPS", 4)
+    monkeypatch.setattr(cfg, "SIM_MOVE_DURATION", 0.2)
+
+    PlatformRunner(affordances=SAR_AFFORDANCES, behaviors=SAR_BEHAVIORS)
+    agents = [SimulatedAgent(set(), i) for i in range(3)]
+    situational_graph = SituationalGraph()
+    mission_runner = MissionRunner(agents, situational_graph, ExplorationMissionInitializer())
+    return mission_runner, agents, situational_graph
+
+
+def record_moves(agents):
+    """the (agent, start, end) times of every move of the agents, on whichever thread it runs"""
+    moves = []
+    for agent in agents:
+
+        def timed_move(*args, agent=agent, move=agent._move_to_pos_implementation):
+            start = time.perf_counter()
+            move(*args)
+            moves.append((agent, start, time.perf_counter()))
+
+        agent._move_to_pos_implementation = timed_move
+
+    return moves
+
+
+def moves_of_different_agents_overlap(moves) -> bool:
+    return any(
+        agent_a is not agent_b and start_a < end_b and start_b < end_a
+        for agent_a, start_a, end_a in moves
+        for agent_b, start_b, end_b in moves
+    )
+
+
+def test_async_mission_moves_agents_concurrently(slow_villa_mission):
+    mission_runner, agents, situational_graph = slow_villa_mission
+    moves = record_moves(agents)
+
+    asyncio.run(mission_runner.mission_main_loop_async(agents, situational_graph))
+
+    assert mission_runner.step == 4
+    assert sum(agent.steps_taken for agent in agents) >= 6
+    assert moves_of_different_agents_overlap(moves)
+
+
+def test_threaded_platform_moves_agents_concurrently(slow_villa_mission, monkeypatch):
+    mission_runner, agents, situational_graph = slow_villa_mission
+    monkeypatch.setattr(cfg, "THREADED_PLATFORM", True)
+    moves = record_moves(agents)
+
+    while mission_runner.step < cfg.MAX_STEPS:
+        mission_runner.inner_loop(agents, situational_graph)
+
+    assert sum(agent.steps_taken for agent in agents) >= 6
+    assert moves_of_different_agents_overlap(moves)
+
+
+def test_headless_mission_returns_after_max_steps(slow_villa_mission, monkeypatch):
+    mission_runner, agents, situational_graph = slow_villa_mission
+    monkeypatch.setattr(cfg, "PLOT_LVL", PlotLvl.NONE)
+    monkeypatch.setattr(cfg, "SIM_MOVE_DURATION", 0.0)
+
+    operator_runner.run()
+    mission_runner.mission_main_loop(agents, situational_graph)
+
+    assert mission_runner.step == cfg.MAX_STEPS
+    assert not any(
+        event_system.has_subscribers(topic)
+        for topic in Topics
+        if topic.name.startswith("VIEW__")
+    )
+
+
+def test_async_agents_wake_up_for_tasks_only_they_can_do(monkeypatch):
+    monkeypatch.setattr(event_system, "subscriptions", {})
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    sg = SituationalGraph()
+    wp = sg.add_node_of_type((0, 0), Situations.WAYPOINT)
+    frontier = sg.add_node_with_task_and_edges_from_affordances(
+        wp, Situations.FRONTIER, (1, 0), SAR_AFFORDANCES
+    )
+
+    assessor, explorer = SimulatedAgent({Capabilities.CAN_ASSESS}, 0), SimulatedAgent(set(), 1)
+    for agent in (assessor, explorer):
+        agent.at_wp = wp
+        agent.init_explore_step_completed = True
+    explorer.task = sg.tasks[0]
+
+    executed = []
+
+    async def platform_stub(data):
+        # exploring the frontier finds a victim which only the assessor can assess
+        executed.append((data.agent, data.agent.task.objective_enum))
+        sg.remove_node_and_tasks(data.agent.task.edge[1])
+        data.agent.clear_task()
+        if data.agent is explorer:
+            sg.add_node_with_task_and_edges_from_affordances(
+                wp, Situations.UNKNOWN_VICTIM, (0, 1), SAR_AFFORDANCES
+            )
+
+    event_system.subscribe(Topics.RUN_PLATFORM_ASYNC, platform_stub)
+    mission_runner = MissionRunner([assessor, explorer], sg, StartWhereYouAre())
+    asyncio.run(mission_runner.mission_main_loop_async([assessor, explorer], sg))
+
+    assert frontier not in sg.G
+    assert executed == [
+        (explorer, Objectives.EXPLORE_ALL_FTS),
+        (assessor, Objectives.ASSES_ALL_VICTIMS),
+    ]
+    assert sg.check_if_tasks_exhausted()
+
+
+def test_async_agent_without_progress_does_not_starve_the_others(monkeypatch):
+    monkeypatch.setattr(event_system, "subscriptions", {})
+    monkeypatch.setattr(cfg, "MAX_STEPS", 20)
+    sg = SituationalGraph()
+    wp = sg.add_node_of_type((0, 0), Situations.WAYPOINT)
+    for pos in ((1, 0), (0, 1)):
+        sg.add_node_with_task_and_edges_from_affordances(wp, Situations.FRONTIER, pos, SAR_AFFORDANCES)
+
+    stuck, worker = SimulatedAgent(set(), 0), SimulatedAgent(set(), 1)
+    for agent, task in zip((stuck, worker), sg.tasks):
+        agent.at_wp = wp
+        agent.init_explore_step_completed = True
+        agent.task = task
+
+    worked = []
+
+    async def platform_stub(data):
+        # the stuck agent cannot plan, so its steps change nothing and never await
+        if data.agent is worker:
+            worked.append(data.agent.task)
+            sg.remove_node_and_tasks(data.agent.task.edge[1])
+            data.agent.clear_task()
+
+    event_system.subscribe(Topics.RUN_PLATFORM_ASYNC, platform_stub)
+    mission_runner = MissionRunner([stuck, worker], sg, StartWhereYouAre())
+    asyncio.run(mission_runner.mission_main_loop_async([stuck, worker], sg))
+
+    assert len(worked) == 1
+    assert mission_runner._graph_generation == 1 + 2  # the task of the worker, and both agents leaving
+
+
+def test_operator_tasks_wake_up_waiting_async_agents(monkeypatch):
+    monkeypatch.setattr(event_system, "subscriptions", {})
+    monkeypatch.setattr(cfg, "MAX_STEPS", 20)
+    sg = SituationalGraph()
+    wp = sg.add_node_of_type((0, 0), Situations.WAYPOINT)
+    sg.add_node_with_task_and_edges_from_affordances(wp, Situations.FRONTIER, (1, 0), SAR_AFFORDANCES)
+    operator_task = Task(sg.add_edge_of_type(wp, wp, Behaviors.GOTO), Objectives.EXPLORE_ALL_FTS)
+
+    idle, busy = SimulatedAgent(set(), 0), SimulatedAgent(set(), 1)
+    for agent in (idle, busy):
+        agent.at_wp = wp
+        agent.init_explore_step_completed = True
+    busy.task = sg.tasks[0]
+
+    executed = []
+
+    async def platform_stub(data):
+        if data.agent is idle:
+            executed.append(data.agent.task)
+            sg.tasks.remove(data.agent.task)
+            data.agent.clear_task()
+        elif not executed:
+            # the busy agent makes no progress while the operator hands out a task from another thread
+            thread = threading.Thread(
+                target=event_system.post_event, args=(Topics.OPERATOR_TASK, operator_task)
+            )
+            thread.start()
+            thread.join()
+            await asyncio.sleep(0.01)
+
+    event_system.subscribe(Topics.RUN_PLATFORM_ASYNC, platform_stub)
+    mission_runner = MissionRunner([idle, busy], sg, StartWhereYouAre())
+    asyncio.run(
+        asyncio.wait_for(mission_runner.mission_main_loop_async([idle, busy], sg), timeout=5)
+    )
+
+    assert executed[0] is operator_task
+
+
+def test_async_explore_recovers_from_a_failed_move_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    sg = SituationalGraph()
+    agent = SimulatedAgent(set(), 0)
+    wp = sg.add_node_of_type(agent.get_localization(), Situations.WAYPOINT)
+    frontier = sg.add_node_with_task_and_edges_from_affordances(
+        wp, Situations.FRONTIER, (agent.pos[0] + 3, agent.pos[1]), SAR_AFFORDANCES
+    )
+    agent.at_wp = wp
+    agent.init_explore_step_completed = True
+
+    move_threads = []
+
+    def stuck(target_pos, target_heading):
+        move_threads.append(threading.current_thread())
+
+    monkeypatch.setattr(agent, "_move_to_pos_implementation", stuck)
+
+    edge = sg.tasks[0].edge
+    result = asyncio.run(ExploreBehavior(SAR_AFFORDANCES).pipeline_async(agent, sg, edge))
+
+    assert result.success
+    assert frontier not in sg.G
+    assert move_threads and threading.main_thread() not in move_threads
+
+
+def test_a_standing_agent_senses_again_every_step(monkeypatch):
+    monkeypatch.setattr(event_system, "subscriptions", {})
+    sg = SituationalGraph()
+    agent = SimulatedAgent(set(), 0)
+    agent.at_wp = sg.add_node_of_type(agent.get_localization(), Situations.WAYPOINT)
+    agent.init_explore_step_completed = True
+    event_system.subscribe(Topics.RUN_PLATFORM, lambda data: None)
+    mission_runner = MissionRunner([agent], sg, StartWhereYouAre())
+
+    lg = agent.get_local_grid()
+    # e.g. a door closed in front of the robot while it waited
+    monkeypatch.setattr(agent, "_get_local_grid_img", lambda: np.zeros_like(lg.img_data))
+    assert agent.get_local_grid() is lg
+
+    mission_runner.inner_loop([agent], sg)
+
+    assert agent.get_local_grid().occupied.all()
+
+
+@pytest.mark.parametrize("line_of_sight", [True, False])
+def test_agent_is_connected_to_the_graph_when_its_edge_is_removed_during_the_move(
+    monkeypatch, line_of_sight
+):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    sg = SituationalGraph()
+    agent = SimulatedAgent(set(), 0)
+    start_pos = agent.get_localization()
+    wp = sg.add_node_of_type(start_pos, Situations.WAYPOINT)
+    frontier_pos = (start_pos[0] + 1, start_pos[1])
+    frontier = sg.add_node_with_task_and_edges_from_affordances(
+        wp, Situations.FRONTIER, frontier_pos, SAR_AFFORDANCES
+    )
+    agent.at_wp = wp
+    agent.init_explore_step_completed = True
+    if not line_of_sight:
+        lg_img = agent._get_local_grid_img()
+        monkeypatch.setattr(agent, "_get_local_grid_img", lambda: np.zeros_like(lg_img))
+
+    def move_while_another_agent_prunes_the_frontier(target_pos, target_heading):
+        agent.pos = target_pos
+        if frontier in sg.G:
+            sg.remove_node_and_tasks(frontier)
+
+    monkeypatch.setattr(
+        agent, "_move_to_pos_implementation", move_while_another_agent_prunes_the_frontier
+    )
+
+    edge = sg.tasks[0].edge
+    result = asyncio.run(ExploreBehavior(SAR_AFFORDANCES).pipeline_async(agent, sg, edge))
+
+    assert not result.success
+    if line_of_sight:
+        assert agent.get_localization() == frontier_pos
+        assert agent.at_wp != wp
+        assert sg.get_node_data_by_node(agent.at_wp)["pos"] == frontier_pos
+        assert sg.G.has_edge(agent.at_wp, wp) and sg.G.has_edge(wp, agent.at_wp)
+    else:
+        assert agent.get_localization() == start_pos
+        assert agent.at_wp == wp
@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.config import Scenario, cfg
+from src.mission_autonomy.shortcut_finder import ShortcutFinder
+from src.platform_autonomy.state.global_occupancy_map import GlobalOccupancyMap
+from src.platform_autonomy.state.local_grid import LocalGrid
+from src.shared.prior_knowledge.sar_situations import Situations
+from src.shared.situational_graph import SituationalGraph
+
+
+def test_shortcut_between_waypoints_never_visited_in_sequence(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    monkeypatch.setattr(cfg, "ROBOT_RADIUS", 0.0)
+
+    n = int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL)
+    global_map = GlobalOccupancyMap()
+    global_map.fuse(LocalGrid((0, 0), np.full((n, n, 4), 255, dtype=np.uint8)))
+
+    # a detour a -> b -> c around the straight line between a and c
+    side = cfg.LG_LEN_IN_M / 5
+    sg = SituationalGraph()
+    a = sg.add_node_of_type((-side, 0), Situations.WAYPOINT)
+    b = sg.add_node_of_type((0, 2 * side), Situations.WAYPOINT)
+    c = sg.add_node_of_type((side, 0), Situations.WAYPOINT)
+    sg.add_waypoint_diedge(a, b)
+    sg.add_waypoint_diedge(b, c)
+
+    n_added = ShortcutFinder().find_shortcuts(sg, global_map)
+
+    assert n_added == 1
+    assert sg.G.has_edge(a, c) and sg.G.has_edge(c, a)
+
+
+def test_a_pass_stays_within_the_max_extent(monkeypatch):
+    monkeypatch.setattr(cfg, "SCENARIO", Scenario.SIM_VILLA)
+    monkeypatch.setattr(cfg, "ROBOT_RADIUS", 0.0)
+
+    n = int(cfg.LG_LEN_IN_M / cfg.LG_MTR_PER_CELL)
+    far = 10 * cfg.GLOBAL_SHORTCUT_MAX_EXTENT
+    global_map = GlobalOccupancyMap()
+    side = cfg.LG_LEN_IN_M / 5
+    sg = SituationalGraph()
+    detours = []
+    for x in (0, far):
+        global_map.fuse(LocalGrid((x, 0), np.full((n, n, 4), 255, dtype=np.uint8)))
+        a = sg.add_node_of_type((x - side, 0), Situations.WAYPOINT)
+        b = sg.add_node_of_type((x, 2 * side), Situations.WAYPOINT)
+        c = sg.add_node_of_type((x + side, 0), Situations.WAYPOINT)
+        sg.add_waypoint_diedge(a, b)
+        sg.add_waypoint_diedge(b, c)
+        detours.append((a, c))
+
+    finder = ShortcutFinder()
+    assert finder.find_shortcuts(sg, global_map) == 1
+    assert sg.G.has_edge(*detours[0]) and not sg.G.has_edge(*detours[1])
+    assert finder.find_shortcuts(sg, global_map) == 1
+    assert sg.G.has_edge(*detours[1])
@@ -0,0 +1,47 @@
+from src.shared.spatial_hash import SpatialHash
+
+
+def test_query_box_is_strict():
+    index = SpatialHash(1.0)
+    index.insert("a", (0.5, 0.5))
+    index.insert("b", (2.0, 0.5))
+
+    assert index.query_box((0, 0), 2.0) == ["a"]
+
+
+def test_query_radius_returns_distances():
+    index = SpatialHash(1.0)
+    index.insert("a", (3.0, 4.0))
+    index.insert("b", (-10.0, 0.0))
+
+    assert index.query_radius((0, 0), 5.0) == [("a", 5.0)]
+
+
+def test_insert_moves_and_remove_deletes():
+    index = SpatialHash(1.0)
+    index.insert("a", (0.0, 0.0))
+    index.insert("a", (20.0, 20.0))
+
+    assert len(index) == 1
+    assert index.query_box((0, 0), 1.0) == []
+    assert index.query_box((20, 20), 1.0) == ["a"]
+
+    index.remove("a")
+    assert "a" not in index
+    assert index.query_box((20, 20), 1.0) == []
+
+
+def test_nearest_matches_brute_force():
+    positions = {i: ((i * 7919) % 101 / 3.0, (i * 104729) % 97 / 5.0) for i in range(200)}
+    index = SpatialHash(2.0)
+    for key, pos in positions.items():
+        index.insert(key, pos)
+
+    query = (10.0, 7.5)
+    brute_force = sorted(
+        positions,
+        key=lambda key: (positions[key][0] - query[0]) ** 2
+        + (positions[key][1] - query[1]) ** 2,
+    )
+
+    assert [key for key, _ in index.nearest(query, 10)] == brute_force[:10]
@@ -0,0 +1,40 @@
+from src.config import MissionStage, cfg
+from src.core.step_scheduler import StepScheduler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_stages_run_at_their_own_period_and_interval(monkeypatch):
+    monkeypatch.setattr(cfg, "STAGE_PERIODS", {MissionStage.INFO_LOG: 50})
+    monkeypatch.setattr(cfg, "STAGE_INTERVALS", {MissionStage.RENDERING: 10.0})
+    monkeypatch.setattr(cfg, "STAGE_TIME_BUDGETS", {})
+    clock = FakeClock()
+    scheduler = StepScheduler(clock)
+
+    for step in range(100):
+        assert scheduler.is_due(MissionStage.PLANNING, step)
+        assert scheduler.is_due(MissionStage.INFO_LOG, step) == (step % 50 == 0)
+        assert scheduler.is_due(MissionStage.RENDERING, step) == (step % 10 == 0)
+        clock.now += 1.0
+
+
+def test_a_stage_over_its_budget_runs_less_often(monkeypatch):
+    monkeypatch.setattr(cfg, "STAGE_TIME_BUDGETS", {MissionStage.STATS: 0.25})
+    clock = FakeClock()
+    scheduler = StepScheduler(clock)
+
+    stats_steps = []
+    for step in range(100):
+        if scheduler.is_due(MissionStage.STATS, step):
+            stats_steps.append(step)
+            with scheduler.timed(MissionStage.STATS):
+                clock.now += 1.0
+
+    # a stage which takes 4 budgets runs every 4th step, after the first run which it had credit for
+    assert stats_steps == [0] + list(range(3, 100, 4))
@@ -0,0 +1,123 @@
+from src.config import UtilityMode, cfg
+from src.mission_autonomy.task_allocator import TaskAllocator
+from src.platform_autonomy.control.sim.simulated_agent import SimulatedAgent
+from src.shared.prior_knowledge.sar_situations import Situations
+from src.shared.situational_graph import SituationalGraph
+from src.usecases.search_and_rescue.sar_affordances import SAR_AFFORDANCES
+
+
+def create_graph_with_two_frontiers():
+    sg = SituationalGraph()
+    wp = sg.add_node_of_type((0, 0), Situations.WAYPOINT)
+    sg.add_node_with_task_and_edges_from_affordances(
+        wp, Situations.FRONTIER, (2, 0), SAR_AFFORDANCES
+    )
+    sg.add_node_with_task_and_edges_from_affordances(
+        wp, Situations.FRONTIER, (-2.1, 0), SAR_AFFORDANCES
+    )
+    return sg, wp
+
+
+def test_naive_selects_closest_frontier(monkeypatch):
+    monkeypatch.setattr(cfg, "UTILITY_MODE", UtilityMode.NAIVE)
+    sg, wp = create_graph_with_two_frontiers()
+    other_agent = SimulatedAgent()
+    other_agent.pos = (2, 0)
+
+    task = TaskAllocator().single_agent_task_selection(wp, sg, [other_agent])
+
+    assert sg.G.nodes[task.edge[1]]["pos"] == (2, 0)
+
+
+def test_dispersion_avoids_frontier_near_other_agent(monkeypatch):
+    monkeypatch.setattr(cfg, "UTILITY_MODE", UtilityMode.DISPERSION)
+    sg, wp = create_graph_with_two_frontiers()
+    other_agent = SimulatedAgent()
+    other_agent.pos = (2, 0)
+
+    task = TaskAllocator().single_agent_task_selection(wp, sg, [other_agent])
+
+    assert sg.G.nodes[task.edge[1]]["pos"] == (-2.1, 0)
+
+
+def spy_on_prefilter(monkeypatch):
+    """records the targets of every bounded search and the result of every prefiltered evaluation"""
+    searches, evaluations = [], []
+    bounded_dijkstra = TaskAllocator._bounded_dijkstra
+    prefiltered = TaskAllocator._prefiltered_task_utilities
+
+    def spied_dijkstra(situational_graph, source, targets):
+        path_costs = bounded_dijkstra(situational_graph, source, targets)
+        searches.append((source, targets, path_costs))
+        return path_costs
+
+    def spied_prefiltered(self, *args):
+        evaluations.append(prefiltered(self, *args))
+        return evaluations[-1]
+
+    monkeypatch.setattr(TaskAllocator, "_bounded_dijkstra", staticmethod(spied_dijkstra))
+    monkeypatch.setattr(TaskAllocator, "_prefiltered_task_utilities", spied_prefiltered)
+    return searches, evaluations
+
+
+def test_prefilter_selects_same_task_as_full_evaluation(monkeypatch):
+    monkeypatch.setattr(cfg, "UTILITY_MODE", UtilityMode.NAIVE)
+    monkeypatch.setattr(cfg, "TASK_PREFILTER_K", 3)
+
+    sg = SituationalGraph()
+    wps = [sg.add_node_of_type((x * 1.5, (x * 7) % 5 * 1.0), Situations.WAYPOINT) for x in range(20)]
+    for a, b in zip(wps, wps[1:]):
+        sg.add_waypoint_diedge(a, b)
+    for i, wp in enumerate(wps):
+        pos = sg.G.nodes[wp]["pos"]
+        sg.add_node_with_task_and_edges_from_affordances(
+            wp, Situations.FRONTIER, (pos[0], pos[1] + 1 + i % 3), SAR_AFFORDANCES
+        )
+    sg.add_node_with_task_and_edges_from_affordances(
+        wps[-1], Situations.UNKNOWN_VICTIM, (30, 0), SAR_AFFORDANCES
+    )
+    searches, evaluations = spy_on_prefilter(monkeypatch)
+
+    for source in wps:
+        # the prefilter goes first, so it finds no cached distance field and searches itself
+        monkeypatch.setattr(cfg, "TASK_PREFILTER", True)
+        prefiltered = TaskAllocator().single_agent_task_selection(source, sg)
+        monkeypatch.setattr(cfg, "TASK_PREFILTER", False)
+        assert prefiltered is TaskAllocator().single_agent_task_selection(source, sg)
+
+    assert len(searches) == len(wps)
+    assert any(evaluation is not None for evaluation in evaluations)
+    for source, targets, path_costs in searches:
+        distance = sg.get_distance_field(source).distance
+        assert all(path_costs[target] == distance[target] for target in targets)
+
+
+def test_prefilter_falls_back_when_the_nearest_tasks_are_far_by_path(monkeypatch):
+    monkeypatch.setattr(cfg, "UTILITY_MODE", UtilityMode.NAIVE)
+    monkeypatch.setattr(cfg, "TASK_PREFILTER_K", 1)
+
+    # the closest frontier is behind a wall, the one further away is straight ahead
+    sg = SituationalGraph()
+    wps = [
+        sg.add_node_of_type(pos, Situations.WAYPOINT)
+        for pos in [(0, 0), (0, 20), (2, 20), (2, 1), (8, 0)]
+    ]
+    for a, b in zip(wps[:4], wps[1:4]):
+        sg.add_waypoint_diedge(a, b)
+    sg.add_waypoint_diedge(wps[0], wps[4])
+    sg.add_node_with_task_and_edges_from_affordances(
+        wps[3], Situations.FRONTIER, (1.5, 0), SAR_AFFORDANCES
+    )
+    sg.add_node_with_task_and_edges_from_affordances(
+        wps[4], Situations.FRONTIER, (9, 0), SAR_AFFORDANCES
+    )
+    searches, evaluations = spy_on_prefilter(monkeypatch)
+
+    monkeypatch.setattr(cfg, "TASK_PREFILTER", True)
+    prefiltered = TaskAllocator().single_agent_task_selection(wps[0], sg)
+    monkeypatch.setattr(cfg, "TASK_PREFILTER", False)
+    expected = TaskAllocator().single_agent_task_selection(wps[0], sg)
+
+    assert len(searches) == 1 and evaluations == [None]
+    assert prefiltered is expected
+    assert sg.G.nodes[expected.edge[1]]["pos"] == (9, 0)